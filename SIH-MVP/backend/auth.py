@@ -0,0 +1,102 @@
+import functools
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import g, jsonify, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from werkzeug.security import check_password_hash
+
+# Without SESSION_SECRET a random key is made at import: tokens then only
+# outlive a restart if the key is configured. Under gunicorn --preload the
+# key is made once in the master, so every worker accepts every token.
+SESSION_SECRET = os.environ.get('SESSION_SECRET') or secrets.token_hex(32)
+SESSION_MAX_AGE = int(os.environ.get('SESSION_MAX_AGE', str(12 * 3600)))
+
+# Password hashing is CPU-bound (PBKDF2/scrypt release the GIL, so threads
+# do run in parallel). At most HASH_WORKERS hashes run at once per process
+# and HASH_QUEUE_LIMIT more may wait; anything beyond that is turned away
+# at once with a 503 instead of queueing behind a login storm.
+HASH_WORKERS = int(os.environ.get('HASH_WORKERS', '1'))
+HASH_QUEUE_LIMIT = int(os.environ.get('HASH_QUEUE_LIMIT', str(4 * HASH_WORKERS)))
+HASH_TIMEOUT = float(os.environ.get('HASH_TIMEOUT', '5'))
+RETRY_AFTER_SECONDS = 1
+
+_serializer = URLSafeTimedSerializer(SESSION_SECRET, salt='session')
+
+
+class Overloaded(RuntimeError):
+    """The password-hash pool is full; the caller should answer 503."""
+
+
+def issue_token(username: str, role: str) -> str:
+    """A signed, timestamped session token for username/role."""
+    return _serializer.dumps({'u': username, 'r': role})
+
+
+def read_token(token: str):
+    """{'username', 'role'} for a valid, unexpired token, else None. One HMAC, no database."""
+    try:
+        data = _serializer.loads(token, max_age=SESSION_MAX_AGE)
+    except (BadSignature, SignatureExpired):
+        return None
+    return {'username': data['u'], 'role': data['r']}
+
+
+def current_session():
+    """The session from the request's `Authorization: Bearer <token>` header, or None."""
+    if 'session' not in g:
+        header = request.headers.get('Authorization', '')
+        scheme, _, token = header.partition(' ')
+        g.session = read_token(token.strip()) if scheme.lower() == 'bearer' and token else None
+    return g.session
+
+
+def require_session(*roles):
+    """Reject requests without a valid session token (401) or with another role (403)."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            session = current_session()
+            if session is None:
+                return jsonify({'message': 'Login required.'}), 401
+            if roles and session['role'] not in roles:
+                return jsonify({'message': 'Not allowed for this account.'}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class PasswordVerifier:
+    """check_password_hash on a bounded thread pool with fail-fast back-pressure."""
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT,
+                 timeout: float = HASH_TIMEOUT):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self.timeout = timeout
+        self.rejected = 0
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        """Check password against password_hash; raises Overloaded when the pool is full or too slow."""
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise Overloaded("Too many logins in progress.")
+        try:
+            future = self._executor.submit(check_password_hash, password_hash, password)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Still queued: drop it and free its slot now.
+            future.cancel()
+            self.rejected += 1
+            raise Overloaded("Login timed out waiting for a password check.")
+
+
+def overloaded_response(error: Overloaded):
+    return jsonify({'message': f"{error} Please retry shortly."}), 503, {'Retry-After': str(RETRY_AFTER_SECONDS)}
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from db import DB_PATH, connect
+from migrations import migrate
+from insights import DEFAULT_THRESHOLDS, load_thresholds, render_rows
+from risk_scores import score_students, upsert_scores
+from training import load_artifacts
+
+CHUNK_ROWS = 50_000
+# --table output. Never risk_scores: that holds the scores the app serves,
+# kept current by its rescore queue.
+BATCH_TABLE = 'batch_risk_scores'
+REQUIRED_COLUMNS = ['student_id', 'attendance_percentage', 'fee_status']
+
+# Set once per worker process by _init_worker.
+_ARTIFACTS = None
+_THRESHOLDS = DEFAULT_THRESHOLDS
+
+
+def _init_worker(thresholds):
+    global _ARTIFACTS, _THRESHOLDS
+    _ARTIFACTS = load_artifacts()
+    _THRESHOLDS = thresholds
+
+
+def read_thresholds(db_path: str) -> dict:
+    """Counseling thresholds from db_path, or the defaults if there is no database."""
+    if not os.path.exists(db_path):
+        return dict(DEFAULT_THRESHOLDS)
+    conn = connect(db_path)
+    try:
+        migrate(conn)
+        return load_thresholds(conn)
+    finally:
+        conn.close()
+
+
+def read_chunks(path: str, chunk_rows: int):
+    """Yield the input as DataFrames of at most chunk_rows rows (CSV or Parquet)."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype={'student_id': str})
+
+
+def prepare_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Check the columns and derive avg_test_score from avgMarks if needed."""
+    missing = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+    if 'avg_test_score' not in chunk.columns:
+        if 'avgMarks' in chunk.columns:
+            chunk = chunk.rename(columns={'avgMarks': 'avg_test_score'})
+        else:
+            missing.append('avg_test_score (or avgMarks)')
+    if missing:
+        raise ValueError(f"Missing columns in input: {missing}")
+    chunk = chunk[['student_id', 'attendance_percentage', 'avg_test_score', 'fee_status']].copy()
+    chunk['student_id'] = chunk['student_id'].astype(str)
+    chunk['fee_status'] = chunk['fee_status'].fillna('').astype(str)
+    return chunk
+
+
+def score_chunk(chunk: pd.DataFrame, render_text: bool, artifacts=None, thresholds=None) -> pd.DataFrame:
+    """Score one prepared chunk; runs inside a worker process.
+
+    With render_text, reasons (a JSON array) and advice are added for file
+    output; the risk_scores table only keeps the reason_codes bitmask.
+    """
+    scored = score_students(chunk, artifacts or _ARTIFACTS, thresholds or _THRESHOLDS)
+    if render_text:
+        reasons, advice = render_rows(scored['reason_codes'], chunk['attendance_percentage'], chunk['avg_test_score'])
+        scored['reasons'] = [json.dumps(row_reasons) for row_reasons in reasons]
+        scored['advice'] = advice
+    return scored
+
+
+class CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        self.header = True
+
+    def write(self, df, model_version):
+        df.to_csv(self.path, mode='w' if self.header else 'a', header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa, self._pq = pa, pq
+        self.path = path
+        self._writer = None
+
+    def write(self, df, model_version):
+        table = self._pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class TableWriter:
+    """Upserts results into the batch_risk_scores table, one transaction per chunk."""
+
+    def __init__(self, db_path):
+        self.conn = connect(db_path)
+        migrate(self.conn)
+
+    def write(self, df, model_version):
+        with self.conn:
+            upsert_scores(self.conn, df, model_version, table=BATCH_TABLE)
+
+    def close(self):
+        self.conn.close()
+
+
+def open_writer(output: str = None, db_path: str = None):
+    if output is None:
+        return TableWriter(db_path)
+    if output.endswith('.parquet'):
+        return ParquetWriter(output)
+    return CsvWriter(output)
+
+
+def run(input_path: str, writer, workers: int = 1, chunk_rows: int = CHUNK_ROWS,
+        thresholds=DEFAULT_THRESHOLDS, render_text: bool = True) -> dict:
+    """Stream input_path through the model and hand each scored chunk to writer.
+
+    At most 2 * workers chunks are in flight, so memory stays bounded by
+    the chunk size no matter how large the input is. Output order matches
+    the input.
+    """
+    artifacts = load_artifacts()
+    if artifacts is None:
+        raise RuntimeError("No model bundle found. Start the server once or retrain first.")
+
+    stats = {'rows': 0, 'chunks': 0, 'seconds': 0.0, 'model_version': artifacts.version}
+    start = time.perf_counter()
+
+    def collect(scored):
+        writer.write(scored, artifacts.version)
+        stats['rows'] += len(scored)
+        stats['chunks'] += 1
+        elapsed = time.perf_counter() - start
+        print(f"  chunk {stats['chunks']}: {stats['rows']:,} rows, {stats['rows'] / elapsed:,.0f} rows/sec")
+
+    chunks = (prepare_chunk(chunk) for chunk in read_chunks(input_path, chunk_rows))
+    if workers <= 1:
+        for chunk in chunks:
+            collect(score_chunk(chunk, render_text, artifacts, thresholds))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(thresholds,)) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(score_chunk, chunk, render_text))
+                if len(pending) >= 2 * workers:
+                    collect(pending.popleft().result())
+            while pending:
+                collect(pending.popleft().result())
+
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a student CSV/Parquet file with the current risk model.")
+    parser.add_argument('input', help="CSV or .parquet with student_id, attendance_percentage, "
+                                      "fee_status and avg_test_score (or avgMarks)")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--output', help="write results to this .csv or .parquet file")
+    target.add_argument('--table', action='store_true', help=f"upsert results into the {BATCH_TABLE} table")
+    parser.add_argument('--db', default=DB_PATH,
+                        help="database for --table and for the counseling thresholds")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    writer = open_writer(args.output, args.db)
+    try:
+        stats = run(args.input, writer, workers=args.workers, chunk_rows=args.chunk_rows,
+                    thresholds=read_thresholds(args.db), render_text=args.output is not None)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return
+    finally:
+        writer.close()
+
+    target_name = args.output or f"{BATCH_TABLE} in {args.db}"
+    rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+    print(f"✅ Scored {stats['rows']:,} rows with model {stats['model_version']} into {target_name} "
+          f"in {stats['seconds']:.2f}s ({rate:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
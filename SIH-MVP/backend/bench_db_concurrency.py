@@ -0,0 +1,83 @@
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from db import PRAGMAS, ConnectionPool
+
+READERS = 4
+WRITE_BATCHES = 40
+ROWS_PER_BATCH = 5000
+
+# The pre-pool behaviour: default rollback journal, no tuning.
+LEGACY_PRAGMAS = ("PRAGMA journal_mode=DELETE", "PRAGMA busy_timeout=30000")
+
+
+def run(label, db_path, pragmas):
+    pool = ConnectionPool(db_path, size=READERS + 1, pragmas=pragmas)
+    with pool.connection() as conn:
+        student_ids = [row[0] for row in conn.execute("SELECT student_id FROM students")]
+
+    writing = threading.Event()
+    done = threading.Event()
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def writer():
+        writing.set()
+        try:
+            for batch in range(WRITE_BATCHES):
+                rows = [(f"BENCH{batch}", "DSA", i, i % 100) for i in range(ROWS_PER_BATCH)]
+                with pool.transaction() as conn:
+                    conn.executemany(
+                        "INSERT INTO test_scores (student_id, subject, test_number, test_score) VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+        finally:
+            done.set()
+
+    def reader():
+        writing.wait()
+        local = []
+        i = 0
+        while not done.is_set():
+            student_id = student_ids[i % len(student_ids)]
+            start = time.perf_counter()
+            with pool.connection() as conn:
+                conn.execute(
+                    "SELECT AVG(test_score) FROM test_scores WHERE student_id = ?", (student_id,)
+                ).fetchone()
+            local.append(time.perf_counter() - start)
+            i += 1
+        with latencies_lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=reader) for _ in range(READERS)]
+    threads.append(threading.Thread(target=writer))
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    pool.close()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:<10} reads={len(latencies):>7} reads/s={len(latencies) / elapsed:>9.0f} "
+          f"p50={statistics.median(latencies) * 1000:>7.2f}ms p99={p99:>7.2f}ms max={latencies[-1] * 1000:>8.2f}ms")
+
+
+def main():
+    print(f"{READERS} reader threads vs. 1 writer inserting {WRITE_BATCHES} x {ROWS_PER_BATCH} score rows")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, pragmas in (("legacy", LEGACY_PRAGMAS), ("pooled+WAL", PRAGMAS)):
+            db_path = os.path.join(tmp, f"{label.replace('+', '_')}.db")
+            shutil.copy('students.db', db_path)
+            run(label, db_path, pragmas)
+
+
+if __name__ == "__main__":
+    main()
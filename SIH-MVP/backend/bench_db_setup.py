@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import db_setup
+from db_setup import create_database, insert_data, load_and_validate_csv, parse_subjects_json, transform_data
+
+
+# ---- The previous loader, kept here for comparison ----
+def legacy_transform_data(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Transform CSV data into students and test_scores DataFrames."""
+    students_data = []
+    test_scores_data = []
+    
+    for _, row in df.iterrows():
+        # Student data
+        student = {
+            'student_id': row['student_id'],
+            'name': row['name'],
+            'prn': row['prn'],
+            'fee_status': row['fee_status'],
+            'attendance_percentage': row['attendance_percentage'],
+            'avgMarks': row['avgMarks'],
+            'sem1_att': row['sem1_att'],
+            'sem2_att': row['sem2_att'],
+            'sem3_att': row['sem3_att'],
+            'sem4_att': row['sem4_att'],
+            'sem5_att': row['sem5_att'],
+            'sem6_att': row['sem6_att'],
+            'sem1_cgpa': row['sem1_cgpa'],
+            'sem2_cgpa': row['sem2_cgpa'],
+            'sem3_cgpa': row['sem3_cgpa'],
+            'sem4_cgpa': row['sem4_cgpa'],
+            'sem5_cgpa': row['sem5_cgpa'],
+            'sem6_cgpa': row['sem6_cgpa'],
+            'credits': row['credits'],
+            'wellbeing': row['wellbeing']
+        }
+        students_data.append(student)
+        
+        # Test scores data
+        subjects = parse_subjects_json(row['subjects_json'])
+        for test_num, subject_entry in enumerate(subjects, start=1):
+            test_scores_data.append({
+                'student_id': row['student_id'],
+                'subject': subject_entry['subject'],
+                'test_number': test_num,
+                'test_score': subject_entry['score']
+            })
+    
+    students_df = pd.DataFrame(students_data)
+    test_scores_df = pd.DataFrame(test_scores_data)
+    return students_df, test_scores_df
+
+def legacy_insert_data(conn: sqlite3.Connection, students_df: pd.DataFrame, test_scores_df: pd.DataFrame):
+    """Insert data into the database."""
+    cursor = conn.cursor()
+    
+    # Insert into students table
+    for _, row in students_df.iterrows():
+        try:
+            cursor.execute("""
+                INSERT OR REPLACE INTO students (
+                    student_id, name, prn, fee_status, attendance_percentage,
+                    avgMarks, sem1_att, sem2_att, sem3_att, sem4_att, sem5_att,
+                    sem6_att, sem1_cgpa, sem2_cgpa, sem3_cgpa, sem4_cgpa,
+                    sem5_cgpa, sem6_cgpa, credits, wellbeing
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                row['student_id'], row['name'], row['prn'], row['fee_status'],
+                row['attendance_percentage'], row['avgMarks'], row['sem1_att'],
+                row['sem2_att'], row['sem3_att'], row['sem4_att'], row['sem5_att'],
+                row['sem6_att'], row['sem1_cgpa'], row['sem2_cgpa'], row['sem3_cgpa'],
+                row['sem4_cgpa'], row['sem5_cgpa'], row['sem6_cgpa'], row['credits'],
+                row['wellbeing']
+            ))
+        except sqlite3.Error as e:
+            print(f"Error inserting student {row['student_id']}: {e}")
+    
+    # Insert into test_scores table
+    for _, row in test_scores_df.iterrows():
+        try:
+            cursor.execute("""
+                INSERT INTO test_scores (student_id, subject, test_number, test_score)
+                VALUES (?, ?, ?, ?)
+            """, (
+                row['student_id'], row['subject'], row['test_number'], row['test_score']
+            ))
+        except sqlite3.Error as e:
+            print(f"Error inserting test score for {row['student_id']}: {e}")
+    
+    conn.commit()
+
+# ---- Benchmark ----
+
+def make_csv(path, n_rows, seed=42):
+    """Replicate students_data.csv to n_rows with fresh student ids / PRNs."""
+    base = pd.read_csv('students_data.csv')
+    reps = -(-n_rows // len(base))
+    df = pd.concat([base] * reps, ignore_index=True).iloc[:n_rows].copy()
+    df['student_id'] = [f"B{i}" for i in range(n_rows)]
+    df['prn'] = [f"PRNB{i}" for i in range(n_rows)]
+    df['attendance_percentage'] = np.random.default_rng(seed).integers(40, 100, n_rows)
+    df.to_csv(path, index=False)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run(n_rows, workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'students.csv')
+        make_csv(csv_path, n_rows)
+        df = load_and_validate_csv(csv_path)
+
+        (students_df, scores_df), legacy_transform = timed(legacy_transform_data, df)
+        conn = create_database(os.path.join(tmp, 'legacy.db'))
+        _, legacy_insert = timed(legacy_insert_data, conn, students_df, scores_df)
+        conn.close()
+
+        (students_df, scores_df), bulk_transform = timed(transform_data, df, workers=workers)
+        conn = create_database(os.path.join(tmp, 'bulk.db'))
+        _, bulk_insert = timed(insert_data, conn, students_df, scores_df)
+        conn.close()
+
+    legacy = legacy_transform + legacy_insert
+    bulk = bulk_transform + bulk_insert
+    print(f"{n_rows:>9} | legacy {legacy_transform:7.2f}s + {legacy_insert:7.2f}s = {legacy:7.2f}s"
+          f" | bulk {bulk_transform:6.2f}s + {bulk_insert:6.2f}s = {bulk:6.2f}s | {legacy / bulk:5.1f}x")
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    workers = os.cpu_count() or 1
+    print(f"rows      | transform + insert (bulk transform uses {workers} workers above "
+          f"{db_setup.PARALLEL_MIN_ROWS} rows)")
+    for n_rows in sizes:
+        run(n_rows, workers)
+
+
+if __name__ == "__main__":
+    main()
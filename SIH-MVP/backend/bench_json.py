@@ -0,0 +1,61 @@
+import gzip
+import time
+import warnings
+
+import numpy as np
+from flask import jsonify
+
+import main
+import serialization
+from bench_predict import make_cohort
+
+warnings.filterwarnings('ignore')
+
+
+def legacy_encode(df):
+    """The previous /api/students tail: replace NaN, to_dict, jsonify."""
+    return jsonify(df.replace({np.nan: None}).to_dict(orient="records")).get_data()
+
+
+def make_frame(n_rows):
+    df, _ = main.predict_risk(make_cohort(n_rows))
+    df['name'] = 'Student ' + df['student_id']
+    # Optional columns are mostly empty in real uploads.
+    df['credits'] = np.where(np.arange(n_rows) % 3 == 0, np.nan, 20.0)
+    return df
+
+
+def best_of(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main_bench():
+    main.train_model_once()
+    encoders = [
+        ('jsonify', legacy_encode),
+        ('records', lambda df: serialization.frame_to_json(df)),
+        ('columns', lambda df: serialization.frame_to_json(df, 'columns')),
+    ]
+    backend = 'orjson' if serialization.orjson is not None else 'json'
+    print(f"encoder backend: {backend}")
+    print(f"{'rows':>9} {'encoder':>8} {'time (s)':>9} {'speedup':>8} {'bytes':>11} {'gzip':>10} {'gzip (s)':>9}")
+    with main.app.app_context():
+        for n_rows, repeats in ((1_000, 20), (100_000, 3), (500_000, 1)):
+            df = make_frame(n_rows)
+            baseline = None
+            for name, encode in encoders:
+                elapsed, body = best_of(lambda: encode(df), repeats)
+                baseline = baseline or elapsed
+                gz_elapsed, gz = best_of(
+                    lambda: gzip.compress(body, compresslevel=serialization.GZIP_LEVEL), repeats)
+                print(f"{n_rows:>9} {name:>8} {elapsed:>9.4f} {baseline / elapsed:>7.1f}x "
+                      f"{len(body):>11,} {len(gz):>10,} {gz_elapsed:>9.4f}")
+
+
+if __name__ == "__main__":
+    main_bench()
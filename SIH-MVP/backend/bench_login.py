@@ -0,0 +1,111 @@
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# A login storm against the app in-process: CLIENTS threads post logins
+# back-to-back while one prober times a cheap read route, once with the
+# bounded hash pool and once with hashing effectively unbounded (the old
+# in-request behaviour). Then the cost of a token check vs. a password check.
+CLIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+DURATION = 5.0
+USERS = 1000
+PASSWORD = 'results-day'
+
+
+def _p(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000 if values else 0.0
+
+
+def storm(main, verifier, label):
+    main.PASSWORDS = verifier
+    stop = threading.Event()
+    codes, login_latencies, probe_latencies = [], [], []
+    lock = threading.Lock()
+
+    def client(n):
+        c = main.app.test_client()
+        local_codes, local_latencies = [], []
+        i = n
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = c.post('/api/student-login', json={'username': f'storm{i % USERS}', 'password': PASSWORD})
+            local_latencies.append(time.perf_counter() - start)
+            local_codes.append(response.status_code)
+            if response.status_code == 503:
+                # A well-behaved client backs off as told.
+                stop.wait(float(response.headers.get('Retry-After', 1)))
+            i += CLIENTS
+        with lock:
+            codes.extend(local_codes)
+            login_latencies.extend(local_latencies)
+
+    def prober():
+        c = main.app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            c.get('/api/subjects/scores')
+            probe_latencies.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(CLIENTS)]
+    threads.append(threading.Thread(target=prober))
+    for t in threads:
+        t.start()
+    time.sleep(DURATION)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    ok = codes.count(200)
+    rejected = codes.count(503)
+    login_latencies.sort()
+    probe_latencies.sort()
+    print(f"{label:<10} logins/s={ok / DURATION:>7.1f} 503/s={rejected / DURATION:>8.1f} "
+          f"login p50={_p(login_latencies, 0.5):>7.1f}ms p99={_p(login_latencies, 0.99):>7.1f}ms | "
+          f"other route p50={_p(probe_latencies, 0.5):>6.1f}ms p99={_p(probe_latencies, 0.99):>7.1f}ms")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'students.db')
+        shutil.copy('students.db', db_path)
+        os.environ['STUDENTS_DB'] = db_path
+
+        import main as app_main
+        from auth import HASH_QUEUE_LIMIT, HASH_WORKERS, PasswordVerifier, issue_token, read_token
+        from migrations import migrate
+        from werkzeug.security import check_password_hash, generate_password_hash
+
+        with app_main.connection() as conn:
+            migrate(conn)
+        password_hash = generate_password_hash(PASSWORD)
+        with app_main.transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO users (username, password, role) VALUES (?, ?, 'student')",
+                             ((f'storm{i}', password_hash) for i in range(USERS)))
+
+        print(f"{CLIENTS} login clients for {DURATION:.0f}s each, {os.cpu_count()} CPUs; "
+              f"bounded = {HASH_WORKERS} hash worker(s) + {HASH_QUEUE_LIMIT} queued")
+        storm(app_main, PasswordVerifier(), "bounded")
+        storm(app_main, PasswordVerifier(workers=CLIENTS, queue_limit=0, timeout=60), "unbounded")
+
+        token = issue_token('storm1', 'student')
+        n = 2000
+        start = time.perf_counter()
+        for _ in range(n):
+            read_token(token)
+        token_us = (time.perf_counter() - start) / n * 1e6
+        checks = [0.0] * 5
+        for i in range(len(checks)):
+            start = time.perf_counter()
+            check_password_hash(password_hash, PASSWORD)
+            checks[i] = time.perf_counter() - start
+        print(f"token check {token_us:.1f}us vs password check {statistics.median(checks) * 1000:.1f}ms "
+              f"({statistics.median(checks) * 1e6 / token_us:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import main
+import training
+
+warnings.filterwarnings('ignore')
+LEGACY = None
+
+
+def legacy_predict_risk(current_df):
+    """The previous predict_risk: one-hot DataFrame, concat, predict_proba + predict."""
+    current_encoded = pd.DataFrame(
+        LEGACY.encoder.transform(current_df[['fee_status']]).toarray(),
+        columns=LEGACY.encoder.get_feature_names_out(['fee_status'])
+    )
+    current_df_processed = pd.concat([current_df.drop('fee_status', axis=1), current_encoded], axis=1)
+    X_predict_scaled = LEGACY.scaler.transform(current_df_processed[LEGACY.features])
+
+    predictions = LEGACY.model.predict_proba(X_predict_scaled)
+    high_idx = list(LEGACY.model.classes_).index('High')
+    current_df['high_risk_prob'] = predictions[:, high_idx]
+    current_df['risk_level'] = LEGACY.model.predict(X_predict_scaled)
+    return current_df
+
+
+def make_cohort(n_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'student_id': np.arange(n_rows).astype(str),
+        'attendance_percentage': rng.integers(40, 100, n_rows),
+        'avg_test_score': rng.uniform(20, 100, n_rows).round(1),
+        'fee_status': rng.choice(['Paid', 'Overdue'], n_rows),
+    })
+
+
+def best_of(fn, df, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        frame = df.copy()
+        start = time.perf_counter()
+        fn(frame)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main_bench():
+    global LEGACY
+    # The old path needs the fitted sklearn objects from the joblib pickles.
+    LEGACY = training.load_legacy_artifacts()
+    main.train_model_once()
+    print(f"{'rows':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>8}")
+    for n_rows, repeats in ((1_000, 20), (100_000, 5), (1_000_000, 2)):
+        df = make_cohort(n_rows)
+        legacy = best_of(legacy_predict_risk, df, repeats)
+        vectorized = best_of(main.predict_risk, df, repeats)
+        print(f"{n_rows:>10} {legacy:>12.4f} {vectorized:>15.4f} {legacy / vectorized:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main_bench()
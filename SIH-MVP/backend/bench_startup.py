@@ -0,0 +1,41 @@
+import statistics
+import subprocess
+import sys
+
+RUNS = 5
+
+# Each case runs in a fresh interpreter, so import and load costs are cold.
+CASES = [
+    ("import main (lazy)", "import main"),
+    ("import main + first prediction (bundle)",
+     "import main, pandas as pd; from features import score_frame; "
+     "score_frame(main.get_model(), pd.DataFrame({'attendance_percentage': [80], 'avg_test_score': [70], "
+     "'fee_status': ['Paid']}))"),
+    ("legacy: eager sklearn/xgboost imports + 3 joblib pickles",
+     "import warnings; warnings.filterwarnings('ignore'); "
+     "import sklearn.linear_model, sklearn.preprocessing, xgboost; "
+     "import main, training; training.load_legacy_artifacts()"),
+]
+
+
+def time_case(code):
+    wrapped = (
+        "import time; _start = time.perf_counter()\n"
+        f"{code}\n"
+        "print(time.perf_counter() - _start)"
+    )
+    samples = []
+    for _ in range(RUNS):
+        out = subprocess.run([sys.executable, "-c", wrapped], capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main():
+    print(f"median of {RUNS} cold starts")
+    for label, code in CASES:
+        print(f"{label:<60} {time_case(code):6.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Routes timed at every size; {sid} is a student that exists.
+ROUTES = [
+    ('students_page', '/api/students?limit=100'),
+    ('students_page_sorted', '/api/students?limit=100&sort=-high_risk_prob'),
+    ('students_full', '/api/students'),
+    ('students_full_columns', '/api/students?format=columns'),
+    ('students_search', '/api/students?search={search}&limit=100'),
+    ('students_filter_high', '/api/students?filter=high&limit=100'),
+    ('student_detail', '/api/student/{sid}'),
+    ('student_trends', '/api/student/trends/{sid}'),
+    ('subject_scores', '/api/subjects/scores'),
+]
+# Full-list responses grow with the cohort; time them fewer times.
+FULL_LIST_ROUTES = {'students_full', 'students_full_columns'}
+# A slower run than the baseline by more than this is flagged by --compare.
+REGRESSION_THRESHOLD = 0.10
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux, bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _percentile(sorted_values, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def _timed(fn, *args, **kwargs):
+    """Run fn once; returns (result, seconds, MB it raised the process's peak RSS by)."""
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start, _peak_rss_mb() - rss_before
+
+
+def _traced_peak_mb(fn, *args, **kwargs):
+    """Run fn once under tracemalloc; returns (result, peak traced MB).
+
+    Kept apart from the timed runs, which tracemalloc would slow down.
+    """
+    tracemalloc.start()
+    try:
+        result = fn(*args, **kwargs)
+        return result, tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def bench_size(n_students: int, iterations: int, upload_students: int, workdir: str) -> list:
+    """All measurements for one cohort size; runs in its own process (see main)."""
+    # The app reads students.db and the model bundle from the working
+    # directory: point both at the scratch copy, never the real ones.
+    os.chdir(workdir)
+    os.environ['STUDENTS_DB'] = os.path.join(workdir, 'students.db')
+    os.environ['RETRAIN_AFTER_ROWS'] = '0'
+    bundle = os.path.join(HERE, 'risk_bundle.npz')
+    if os.path.exists(bundle):
+        shutil.copy(bundle, workdir)
+    sys.path.insert(0, HERE)
+
+    from gen_data import write_csv
+    from db_setup import create_database, insert_data, load_and_validate_csv, transform_data
+
+    results = []
+
+    def record(name, seconds, rows=None, **extra):
+        entry = {'size': n_students, 'name': name, 'seconds': seconds, 'rows': rows,
+                 'rows_per_sec': rows / seconds if rows and seconds else None,
+                 'peak_rss_mb': _peak_rss_mb(), **extra}
+        results.append(entry)
+        print(f"  {n_students:>9,} {name:<24} {seconds * 1000:>11.1f} ms"
+              + (f" {entry['rows_per_sec']:>12,.0f} rows/s" if entry['rows_per_sec'] else ''), flush=True)
+
+    csv_path = os.path.join(workdir, 'students.csv')
+    start = time.perf_counter()
+    write_csv(csv_path, n_students)
+    record('generate', time.perf_counter() - start, n_students)
+
+    # db_setup.py: read, transform, create and bulk insert.
+    df, seconds, peak = _timed(load_and_validate_csv, csv_path)
+    record('db_setup.read_csv', seconds, len(df), rss_growth_mb=peak)
+    (students_df, scores_df), seconds, peak = _timed(transform_data, df)
+    record('db_setup.transform', seconds, len(df), rss_growth_mb=peak)
+    conn = create_database(os.environ['STUDENTS_DB'])
+    _, seconds, peak = _timed(insert_data, conn, students_df, scores_df)
+    conn.close()
+    record('db_setup.insert', seconds, len(students_df) + len(scores_df), rss_growth_mb=peak)
+    del df, students_df, scores_df
+
+    import main
+
+    with main.connection() as conn:
+        _, seconds, peak = _timed(main.migrate, conn)
+    record('migrate', seconds, None, rss_growth_mb=peak)
+    (merged, _, _), seconds, peak = _timed(main.get_data_from_db)
+    record('get_data_from_db', seconds, len(merged), rss_growth_mb=peak)
+    main.train_model_once()
+    _, seconds, peak = _timed(main.predict_risk, merged.copy())
+    record('predict_risk', seconds, len(merged), rss_growth_mb=peak)
+    del merged
+    # Every student starts queued: score and persist the whole cohort as
+    # the background worker would, then build the store from stored scores.
+    _, seconds, peak = _timed(main.RESCORER.drain)
+    record('rescore_drain', seconds, n_students, rss_growth_mb=peak)
+    _, seconds, peak = _timed(main.build_risk_store)
+    record('build_risk_store', seconds, n_students, rss_growth_mb=peak)
+
+    client = main.app.test_client()
+    sid = f"S{1000 + n_students // 2}"
+    search = sid[:4].lower()
+    for name, template in ROUTES:
+        path = template.format(sid=sid, search=search)
+        response, peak = _traced_peak_mb(client.get, path)
+        if response.status_code != 200:
+            record(name, 0.0, None, path=path, status=response.status_code)
+            continue
+        count = max(3, iterations // 10) if name in FULL_LIST_ROUTES else iterations
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            client.get(path)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        total = sum(latencies)
+        record(name, _percentile(latencies, 0.5), None, path=path, status=200, peak_traced_mb=peak,
+               p95_seconds=_percentile(latencies, 0.95), p99_seconds=_percentile(latencies, 0.99),
+               req_per_sec=count / total if total else None, response_bytes=len(response.data))
+
+    # /api/upload of new students in the long format, through the job queue.
+    if upload_students:
+        upload_path = os.path.join(workdir, 'upload.csv')
+        upload_rows = write_csv(upload_path, upload_students, start_id=1000 + n_students, seed=7,
+                                upload_format=True)
+        rss_before = _peak_rss_mb()
+        start = time.perf_counter()
+        with open(upload_path, 'rb') as f:
+            response = client.post('/api/upload', data={'file': (f, 'upload.csv')},
+                                   content_type='multipart/form-data')
+        accepted = time.perf_counter() - start
+        job = response.get_json()
+        while job.get('state') not in ('done', 'failed') and response.status_code == 202:
+            time.sleep(0.01)
+            job = client.get(f"/api/jobs/{response.get_json()['job_id']}").get_json()
+        seconds = time.perf_counter() - start
+        record('upload', seconds, upload_rows, rss_growth_mb=_peak_rss_mb() - rss_before,
+               accepted_seconds=accepted, state=job.get('state'), students_added=job.get('students_added'))
+
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list, baseline_path: str):
+    """Print each measurement against the same (size, name) in a previous run."""
+    with open(baseline_path) as f:
+        baseline = {(r['size'], r['name']): r for r in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path}:")
+    regressions = 0
+    for r in results:
+        old = baseline.get((r['size'], r['name']))
+        if not old or not old['seconds'] or not r['seconds']:
+            continue
+        change = r['seconds'] / old['seconds'] - 1
+        flag = '  <-- slower' if change > REGRESSION_THRESHOLD else ''
+        regressions += bool(flag)
+        print(f"  {r['size']:>9,} {r['name']:<24} {old['seconds'] * 1000:>10.1f} -> "
+              f"{r['seconds'] * 1000:>10.1f} ms ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark loading, scoring and every read route on synthetic cohorts.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000],
+                        help="cohort sizes (e.g. 1000 100000 1000000)")
+    parser.add_argument('--iterations', type=int, default=50, help="requests timed per route")
+    parser.add_argument('--upload-students', type=int, default=1_000,
+                        help="new students sent through /api/upload at each size (0 to skip)")
+    parser.add_argument('--output', default='bench_results.json', help="JSON results file")
+    parser.add_argument('--compare', help="previous results file to compare against")
+    args = parser.parse_args()
+
+    print(f"{'size':>11} {'measurement':<24} {'median/total':>14}")
+    results = []
+    # A fresh process per size: module-level state (the risk store, the
+    # connection pool, DB_PATH) starts clean and peak RSS is per size.
+    ctx = multiprocessing.get_context('spawn')
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as workdir, ctx.Pool(1) as pool:
+            results.extend(pool.apply(bench_size, (size, args.iterations, args.upload_students, workdir)))
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'iterations': args.iterations,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare)
+        if regressions:
+            print(f"⚠️ {regressions} measurement(s) more than {REGRESSION_THRESHOLD:.0%} slower.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
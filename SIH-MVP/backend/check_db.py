@@ -1,9 +1,10 @@
 import sqlite3
 import pandas as pd
+from db import connect
 
 def check_database_content():
     try:
-        conn = sqlite3.connect('students.db')
+        conn = connect()
         
         # Check the number of student records
         students_df = pd.read_sql_query("SELECT * FROM students", conn)
@@ -1,27 +1,136 @@
-import pandas as pd
+import argparse
 import sqlite3
+from db import DB_PATH, connect
+from migrations import migrate
 
-def clean_database():
+# Natural key per table. The row with the lowest rowid per key is kept,
+# like the old drop_duplicates(keep='first'). test_scores.id is an alias
+# for its rowid.
+DEDUP_KEYS = {
+    'students': ['student_id'],
+    'test_scores': ['student_id', 'subject', 'test_number'],
+}
+
+# Indexes that make duplicates impossible. A table without one was most
+# likely rewritten by the old to_sql()-based clean_db.py.
+UNIQUE_INDEXES = {
+    'students': 'sqlite_autoindex_students_1',
+    'test_scores': 'ux_test_scores_student_subject_test',
+}
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+def dedup_table(conn, table, key, since_rowid=None):
+    """Delete duplicate rows of `table` by `key` in place; returns the student_ids touched.
+
+    With since_rowid only rows added after it are checked, each against
+    the older rows with the same key: one index lookup per new row, given
+    an index on the key (clean_database makes sure there is one). Earlier
+    rows were already unique, so the result matches a full pass.
+    """
+    if since_rowid is None:
+        sql = f"""
+            DELETE FROM {table}
+            WHERE rowid NOT IN (SELECT MIN(rowid) FROM {table} GROUP BY {', '.join(key)})
+            RETURNING student_id
+        """
+        params = ()
+    else:
+        match = " AND ".join(f"older.{col} IS {table}.{col}" for col in key)
+        sql = f"""
+            DELETE FROM {table}
+            WHERE rowid > ? AND EXISTS (
+                SELECT 1 FROM {table} AS older WHERE {match} AND older.rowid < {table}.rowid
+            )
+            RETURNING student_id
+        """
+        params = (since_rowid,)
+    return [row[0] for row in conn.execute(sql, params).fetchall()]
+
+def _restore_students(conn, student_ids):
+    # The students delete triggers clear search rows and scores by
+    # student_id, which covers the surviving row too. Put them back.
+    student_ids = sorted(set(student_ids))
+    if _table_exists(conn, 'student_search'):
+        conn.executemany("DELETE FROM student_search WHERE student_id = ?", ((sid,) for sid in student_ids))
+        conn.executemany(
+            "INSERT INTO student_search (student_id, name, prn) "
+            "SELECT student_id, name, prn FROM students WHERE student_id = ?",
+            ((sid,) for sid in student_ids)
+        )
+    if _table_exists(conn, 'risk_dirty'):
+        conn.executemany("INSERT OR IGNORE INTO risk_dirty (student_id) VALUES (?)", ((sid,) for sid in student_ids))
+
+def clean_database(db_path=None, full=False):
+    """Remove duplicate students and test scores inside one transaction.
+
+    Set-based SQL only: rows are deleted in place, so constraints, indexes
+    and triggers stay as db_setup.create_database() made them (the
+    subject_stats and rescoring triggers see every delete). Each run
+    records the highest rowid it checked in dedup_state and the next run
+    starts from there; `full` (or a first run) checks everything. Run a
+    full pass after VACUUM, which may renumber students' rowids.
+    Returns {table: rows removed}.
+    """
     try:
-        conn = sqlite3.connect('students.db')
+        conn = connect(db_path)
     except sqlite3.Error as e:
         print(f"Database connection error: {e}")
-        return
-
-    # Clean the 'students' table
-    print("Cleaning 'students' table...")
-    students_df = pd.read_sql_query("SELECT * FROM students", conn)
-    students_df.drop_duplicates(subset=['student_id'], keep='first', inplace=True)
-    students_df.to_sql('students', conn, if_exists='replace', index=False)
-    
-    # Clean the 'test_scores' table (in case of duplicate test entries for a student)
-    print("Cleaning 'test_scores' table...")
-    test_scores_df = pd.read_sql_query("SELECT * FROM test_scores", conn)
-    test_scores_df.drop_duplicates(subset=['student_id', 'subject', 'test_number'], keep='first', inplace=True)
-    test_scores_df.to_sql('test_scores', conn, if_exists='replace', index=False)
-
-    conn.close()
+        return None
+
+    removed = {}
+    try:
+        migrate(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table, key in DEDUP_KEYS.items():
+                index = conn.execute(
+                    "SELECT 1 FROM pragma_index_list(?) WHERE name = ?", (table, UNIQUE_INDEXES[table])
+                ).fetchone()
+                if index is None:
+                    print(f"⚠️ '{table}' has no unique index on {key}; duplicates can come back. "
+                          f"Rebuild with db_setup.py to restore the schema.")
+                    # A plain lookup index, so incremental runs are not a
+                    # scan per new row.
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS ix_dedup_{table} ON {table} ({', '.join(key)})")
+
+                state = conn.execute("SELECT last_rowid FROM dedup_state WHERE table_name = ?", (table,)).fetchone()
+                since_rowid = None if full or state is None else state[0]
+                mode = "all rows" if since_rowid is None else f"rows after rowid {since_rowid}"
+                print(f"Cleaning '{table}' ({mode})...")
+
+                touched = dedup_table(conn, table, key, since_rowid)
+                if table == 'students' and touched:
+                    _restore_students(conn, touched)
+                removed[table] = len(touched)
+
+                last_rowid = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+                conn.execute(
+                    "INSERT OR REPLACE INTO dedup_state (table_name, last_rowid) VALUES (?, ?)",
+                    (table, max(last_rowid, since_rowid or 0))
+                )
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"❌ Error: {e}")
+        return None
+    finally:
+        conn.close()
+
+    for table, count in removed.items():
+        print(f"  {table}: {count} duplicate row(s) removed")
     print("✅ Database cleaned successfully! Duplicates have been removed.")
+    return removed
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove duplicate students and test scores in place.")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--full', action='store_true', help="check every row, not just rows added since the last run")
+    args = parser.parse_args()
+    clean_database(args.db, full=args.full)
 
 if __name__ == "__main__":
-    clean_database()
\ No newline at end of file
+    main()
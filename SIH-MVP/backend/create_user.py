@@ -1,4 +1,5 @@
 import sqlite3
+from db import connect
 from werkzeug.security import generate_password_hash
 
 def create_new_user():
@@ -9,8 +10,9 @@ def create_new_user():
 
     password_hash = generate_password_hash(password)
 
+    conn = None
     try:
-        conn = sqlite3.connect('students.db')
+        conn = connect()
         cursor = conn.cursor()
         
         # Check if username already exists
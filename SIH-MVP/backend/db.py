@@ -0,0 +1,110 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get('STUDENTS_DB', 'students.db')
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+
+# WAL lets readers keep going while an upload holds the write lock;
+# synchronous=NORMAL is durable in WAL mode except across power loss.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",      # 64 MiB page cache per connection
+    "PRAGMA mmap_size=268435456",    # 256 MiB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=30000",
+)
+
+
+def connect(db_path: str = None, pragmas=PRAGMAS) -> sqlite3.Connection:
+    """Open a tuned connection (used directly by the offline scripts)."""
+    conn = sqlite3.connect(
+        db_path or DB_PATH,
+        timeout=30,
+        check_same_thread=False,
+        cached_statements=256,
+    )
+    for pragma in pragmas:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """A small LIFO pool of tuned connections shared across request threads.
+
+    Connections are created on demand; at most `size` idle ones are kept.
+    LIFO reuse keeps the hottest connection (and its statement cache) busy.
+    """
+
+    def __init__(self, db_path: str = None, size: int = POOL_SIZE, pragmas=PRAGMAS):
+        self.db_path = db_path or DB_PATH
+        self.pragmas = pragmas
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = connect(self.db_path, self.pragmas)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Check out a connection and run the block in one write transaction."""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_POOL = None
+_POOL_PID = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return this process's pool.
+
+    A forked worker gets a fresh pool: SQLite connections must not be used
+    across fork, so the ones inherited from the parent are left untouched.
+    """
+    global _POOL, _POOL_PID
+    if _POOL is None or _POOL_PID != os.getpid():
+        with _POOL_LOCK:
+            if _POOL is None or _POOL_PID != os.getpid():
+                _POOL = ConnectionPool()
+                _POOL_PID = os.getpid()
+    return _POOL
+
+
+def connection():
+    """`with connection() as conn:` - borrow a pooled connection."""
+    return get_pool().connection()
+
+
+def transaction():
+    """`with transaction() as conn:` - borrow a connection inside BEGIN IMMEDIATE ... COMMIT."""
+    return get_pool().transaction()
@@ -1,7 +1,11 @@
+import argparse
 import pandas as pd
 import sqlite3
 import json
 import os
+from db import connect
+from ingest import rows_for_insert
+from migrations import migrate, subject_stats_suspended
 from typing import List, Dict
 
 def load_and_validate_csv(file_path: str) -> pd.DataFrame:
@@ -31,143 +35,140 @@ def parse_subjects_json(subjects_json: str) -> List[Dict]:
         print(f"Error parsing subjects_json: {e}")
         return []
 
-def transform_data(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
-    """Transform CSV data into students and test_scores DataFrames."""
-    students_data = []
-    test_scores_data = []
-    
-    for _, row in df.iterrows():
-        # Student data
-        student = {
-            'student_id': row['student_id'],
-            'name': row['name'],
-            'prn': row['prn'],
-            'fee_status': row['fee_status'],
-            'attendance_percentage': row['attendance_percentage'],
-            'avgMarks': row['avgMarks'],
-            'sem1_att': row['sem1_att'],
-            'sem2_att': row['sem2_att'],
-            'sem3_att': row['sem3_att'],
-            'sem4_att': row['sem4_att'],
-            'sem5_att': row['sem5_att'],
-            'sem6_att': row['sem6_att'],
-            'sem1_cgpa': row['sem1_cgpa'],
-            'sem2_cgpa': row['sem2_cgpa'],
-            'sem3_cgpa': row['sem3_cgpa'],
-            'sem4_cgpa': row['sem4_cgpa'],
-            'sem5_cgpa': row['sem5_cgpa'],
-            'sem6_cgpa': row['sem6_cgpa'],
-            'credits': row['credits'],
-            'wellbeing': row['wellbeing']
-        }
-        students_data.append(student)
-        
-        # Test scores data
-        subjects = parse_subjects_json(row['subjects_json'])
-        for test_num, subject_entry in enumerate(subjects, start=1):
-            test_scores_data.append({
-                'student_id': row['student_id'],
-                'subject': subject_entry['subject'],
-                'test_number': test_num,
-                'test_score': subject_entry['score']
-            })
-    
-    students_df = pd.DataFrame(students_data)
-    test_scores_df = pd.DataFrame(test_scores_data)
+STUDENT_COLUMNS = [
+    'student_id', 'name', 'prn', 'fee_status', 'attendance_percentage',
+    'avgMarks', 'sem1_att', 'sem2_att', 'sem3_att', 'sem4_att', 'sem5_att',
+    'sem6_att', 'sem1_cgpa', 'sem2_cgpa', 'sem3_cgpa', 'sem4_cgpa',
+    'sem5_cgpa', 'sem6_cgpa', 'credits', 'wellbeing'
+]
+TEST_SCORE_COLUMNS = ['student_id', 'subject', 'test_number', 'test_score']
+
+# Below this many rows a process pool costs more than it saves.
+PARALLEL_MIN_ROWS = 200_000
+
+def explode_subjects(student_ids: List, subjects_json: List[str]) -> List[tuple]:
+    """Flatten subjects_json into (student_id, subject, test_number, test_score) rows.
+
+    The whole column is decoded with a single json.loads over one JSON
+    array; only if that fails is each row parsed on its own, so bad rows
+    are reported and skipped as before.
+    """
+    try:
+        parsed = json.loads("[" + ",".join(subjects_json) + "]")
+        if len(parsed) != len(subjects_json):
+            raise ValueError("row count mismatch")
+    except (TypeError, ValueError):
+        parsed = [parse_subjects_json(raw) for raw in subjects_json]
+
+    return [
+        (student_id, entry['subject'], test_num, entry['score'])
+        for student_id, subjects in zip(student_ids, parsed)
+        for test_num, entry in enumerate(subjects, start=1)
+    ]
+
+def _explode_chunk(args):
+    return explode_subjects(*args)
+
+def transform_data(df: pd.DataFrame, workers: int = 1) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Transform CSV data into students and test_scores DataFrames.
+
+    With workers > 1 and a large file, subjects_json is parsed across a
+    process pool in contiguous chunks (order is preserved).
+    """
+    students_df = df[STUDENT_COLUMNS].copy()
+
+    student_ids = df['student_id'].tolist()
+    subjects_json = df['subjects_json'].tolist()
+    if workers > 1 and len(df) >= PARALLEL_MIN_ROWS:
+        from concurrent.futures import ProcessPoolExecutor
+
+        step = -(-len(df) // workers)
+        chunks = [(student_ids[i:i + step], subjects_json[i:i + step]) for i in range(0, len(df), step)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            score_rows = [row for rows in pool.map(_explode_chunk, chunks) for row in rows]
+    else:
+        score_rows = explode_subjects(student_ids, subjects_json)
+
+    test_scores_df = pd.DataFrame(score_rows, columns=TEST_SCORE_COLUMNS)
     return students_df, test_scores_df
 
 def create_database(db_name: str) -> sqlite3.Connection:
-    """Create SQLite database and tables."""
-    conn = sqlite3.connect(db_name)
+    """Create SQLite database and tables from scratch (see migrations.py for in-place upgrades)."""
+    conn = connect(db_name)
     cursor = conn.cursor()
     
     # Drop existing tables to ensure correct schema
     cursor.execute("DROP TABLE IF EXISTS test_scores")
     cursor.execute("DROP TABLE IF EXISTS students")
-    
-    # Create students table
-    cursor.execute("""
-        CREATE TABLE students (
-            student_id TEXT PRIMARY KEY,
-            name TEXT,
-            prn TEXT UNIQUE,
-            fee_status TEXT,
-            attendance_percentage INTEGER,
-            avgMarks REAL,
-            sem1_att INTEGER,
-            sem2_att INTEGER,
-            sem3_att INTEGER,
-            sem4_att INTEGER,
-            sem5_att INTEGER,
-            sem6_att INTEGER,
-            sem1_cgpa REAL,
-            sem2_cgpa REAL,
-            sem3_cgpa REAL,
-            sem4_cgpa REAL,
-            sem5_cgpa REAL,
-            sem6_cgpa REAL,
-            credits INTEGER,
-            wellbeing INTEGER
-        )
-    """)
-    
-    # Create test_scores table
-    cursor.execute("""
-        CREATE TABLE test_scores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT,
-            subject TEXT,
-            test_number INTEGER,
-            test_score INTEGER,
-            FOREIGN KEY (student_id) REFERENCES students (student_id)
-        )
-    """)
-    
+    cursor.execute("DROP TABLE IF EXISTS subject_stats")
+    cursor.execute("DROP TABLE IF EXISTS subject_score_buckets")
+    cursor.execute("DROP TABLE IF EXISTS student_search")
+    cursor.execute("DROP TABLE IF EXISTS risk_scores")
+    cursor.execute("DROP TABLE IF EXISTS risk_dirty")
+    cursor.execute("DROP TABLE IF EXISTS counseling_thresholds")
+    cursor.execute("DROP TABLE IF EXISTS upload_jobs")
+    cursor.execute("DROP TABLE IF EXISTS dedup_state")
+    cursor.execute("DROP TABLE IF EXISTS batch_risk_scores")
+    cursor.execute("PRAGMA user_version = 0")
     conn.commit()
+    
+    # Build the tables and indexes through the versioned migrations
+    migrate(conn)
     return conn
 
 def insert_data(conn: sqlite3.Connection, students_df: pd.DataFrame, test_scores_df: pd.DataFrame):
-    """Insert data into the database."""
-    cursor = conn.cursor()
-    
-    # Insert into students table
-    for _, row in students_df.iterrows():
-        try:
-            cursor.execute("""
-                INSERT OR REPLACE INTO students (
-                    student_id, name, prn, fee_status, attendance_percentage,
-                    avgMarks, sem1_att, sem2_att, sem3_att, sem4_att, sem5_att,
-                    sem6_att, sem1_cgpa, sem2_cgpa, sem3_cgpa, sem4_cgpa,
-                    sem5_cgpa, sem6_cgpa, credits, wellbeing
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                row['student_id'], row['name'], row['prn'], row['fee_status'],
-                row['attendance_percentage'], row['avgMarks'], row['sem1_att'],
-                row['sem2_att'], row['sem3_att'], row['sem4_att'], row['sem5_att'],
-                row['sem6_att'], row['sem1_cgpa'], row['sem2_cgpa'], row['sem3_cgpa'],
-                row['sem4_cgpa'], row['sem5_cgpa'], row['sem6_cgpa'], row['credits'],
-                row['wellbeing']
-            ))
-        except sqlite3.Error as e:
-            print(f"Error inserting student {row['student_id']}: {e}")
-    
-    # Insert into test_scores table
-    for _, row in test_scores_df.iterrows():
-        try:
-            cursor.execute("""
-                INSERT INTO test_scores (student_id, subject, test_number, test_score)
+    """Bulk insert both tables with executemany in a single transaction.
+
+    Journaling is relaxed for the load (the database is being rebuilt from
+    the CSV anyway) and restored afterwards; the per-row subject_stats
+    triggers are swapped for one rebuild at the end.
+
+    Rows are kept exactly as row-by-row INSERT OR REPLACE kept them: a row
+    is dropped when a later row has the same student_id or the same
+    (non-null) prn. Dropping them here instead keeps REPLACE (which does
+    not fire the delete triggers) from leaving stale student_search rows,
+    and a UNIQUE conflict from aborting the whole load.
+    """
+    duplicates = (students_df['student_id'].duplicated(keep='last')
+                  | (students_df['prn'].notna() & students_df['prn'].duplicated(keep='last')))
+    if duplicates.any():
+        print(f"Skipped {int(duplicates.sum())} duplicate student rows (same student_id or prn as a later row)")
+        students_df = students_df[~duplicates]
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    try:
+        conn.execute("BEGIN")
+        with subject_stats_suspended(conn):
+            conn.executemany(f"""
+                INSERT INTO students ({", ".join(STUDENT_COLUMNS)})
+                VALUES ({", ".join("?" * len(STUDENT_COLUMNS))})
+            """, rows_for_insert(students_df, STUDENT_COLUMNS))
+
+            inserted = conn.executemany("""
+                INSERT OR IGNORE INTO test_scores (student_id, subject, test_number, test_score)
                 VALUES (?, ?, ?, ?)
-            """, (
-                row['student_id'], row['subject'], row['test_number'], row['test_score']
-            ))
-        except sqlite3.Error as e:
-            print(f"Error inserting test score for {row['student_id']}: {e}")
-    
-    conn.commit()
+            """, rows_for_insert(test_scores_df, TEST_SCORE_COLUMNS)).rowcount
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+    skipped = len(test_scores_df) - inserted
+    if skipped:
+        print(f"Skipped {skipped} duplicate test score rows")
 
 def main():
-    csv_file = 'students_data.csv'
-    db_name = 'students.db'
+    parser = argparse.ArgumentParser(description="Rebuild students.db from a students CSV.")
+    parser.add_argument('csv_file', nargs='?', default='students_data.csv')
+    parser.add_argument('--db', default='students.db')
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processes used to parse subjects_json on large files")
+    args = parser.parse_args()
+    csv_file = args.csv_file
+    db_name = args.db
     
     try:
         # Load and validate CSV
@@ -178,7 +179,7 @@ def main():
         print(df.head().to_string())
         
         # Transform data
-        students_df, test_scores_df = transform_data(df)
+        students_df, test_scores_df = transform_data(df, workers=args.workers)
         
         # Create database and tables
         conn = create_database(db_name)
@@ -1,8 +1,6 @@
-import sqlite3
+from db import DB_PATH, connect
 
-DB_PATH = 'students.db'
-
-conn = sqlite3.connect(DB_PATH)
+conn = connect(DB_PATH)
 cursor = conn.cursor()
 
 # Delete all users with the counselor role
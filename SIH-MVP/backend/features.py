@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from metrics import span
+
+NUMERIC_FEATURES = ['attendance_percentage', 'avg_test_score']
+
+
+def build_feature_matrix(attendance, avg_score, fee_status, fee_categories) -> np.ndarray:
+    """Assemble the model input straight into a preallocated float32 matrix.
+
+    Columns follow FEATURES: attendance, avg score, then one indicator per
+    fee_status category (unknown statuses leave every indicator at 0, like
+    OneHotEncoder(handle_unknown='ignore')).
+    """
+    attendance = np.asarray(attendance, dtype=np.float32)
+    n_rows = attendance.shape[0]
+    X = np.empty((n_rows, len(NUMERIC_FEATURES) + len(fee_categories)), dtype=np.float32)
+
+    X[:, 0] = attendance
+    X[:, 1] = np.asarray(avg_score, dtype=np.float32)
+    np.nan_to_num(X[:, :2], copy=False)
+
+    # Hash lookup to category codes; unknown statuses become -1 and match no column.
+    category_codes = {category: code for code, category in enumerate(fee_categories)}
+    codes = pd.Series(fee_status, copy=False).map(category_codes).fillna(-1).to_numpy(dtype=np.int8)
+    np.equal(codes[:, None], np.arange(len(fee_categories)), out=X[:, 2:], casting='unsafe')
+    return X
+
+
+def scale_features(X: np.ndarray, mean, scale) -> np.ndarray:
+    """Standardize X in place with the fitted StandardScaler parameters."""
+    X -= np.asarray(mean, dtype=np.float32)
+    X /= np.asarray(scale, dtype=np.float32)
+    return X
+
+
+def score_matrix(model, X: np.ndarray, classes=None):
+    """Run one probability pass and derive labels via argmax.
+
+    `classes` names the probability columns (defaults to model.classes_).
+    Returns (high_risk_prob, risk_level) arrays.
+    """
+    proba = model.predict_proba(X)
+    classes = np.asarray(model.classes_ if classes is None else classes)
+    risk_level = classes[np.argmax(proba, axis=1)]
+
+    high_idx = np.flatnonzero(classes == 'High')
+    if high_idx.size:
+        high_risk_prob = proba[:, high_idx[0]]
+    else:
+        high_risk_prob = np.zeros(X.shape[0], dtype=proba.dtype)
+    return high_risk_prob, risk_level
+
+
+def score_frame(artifacts, df):
+    """Score a frame with attendance_percentage, avg_test_score and fee_status columns.
+
+    Returns (high_risk_prob, risk_level) arrays aligned with df's rows.
+    """
+    with span('features') as stage:
+        X = build_feature_matrix(
+            df['attendance_percentage'].to_numpy(),
+            df['avg_test_score'].to_numpy(),
+            df['fee_status'],
+            artifacts.encoder.categories_[0]
+        )
+        scale_features(X, artifacts.scaler.mean_, artifacts.scaler.scale_)
+        stage.rows = X.shape[0]
+    with span('inference') as stage:
+        stage.rows = X.shape[0]
+        return score_matrix(artifacts.model, X, artifacts.classes)
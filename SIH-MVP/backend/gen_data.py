@@ -0,0 +1,104 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from db_setup import STUDENT_COLUMNS
+
+SUBJECTS = ['DSA', 'OS', 'DBMS', 'ComputerNetwork', 'ObjectOrientedProgramming']
+GEN_CHUNK_ROWS = 100_000
+UPLOAD_COLUMNS = ['student_id', 'attendance_percentage', 'fee_status', 'subject', 'test_score', 'test_number']
+
+
+def generate_students(n_rows: int, start_id: int = 1000, seed: int = 42):
+    """Synthetic students in the students_data.csv layout (subjects_json included).
+
+    Returns (df, scores), scores being the (n_rows, len(SUBJECTS)) test
+    score matrix behind subjects_json.
+
+    Distributions follow the sample file: two correlated latent traits,
+    engagement and ability, drive attendance, marks, CGPA, wellbeing and
+    the chance of an overdue fee, so every risk level shows up in
+    realistic proportions.
+    """
+    rng = np.random.default_rng(seed)
+    engagement = rng.standard_normal(n_rows)
+    ability = 0.6 * engagement + 0.8 * rng.standard_normal(n_rows)
+
+    attendance = np.clip(np.rint(70 + 17 * engagement), 30, 100).astype(int)
+    scores = np.clip(np.rint(68 + 18 * ability[:, None] + 6 * rng.standard_normal((n_rows, len(SUBJECTS)))),
+                     0, 100).astype(int)
+    avg_marks = np.round(scores.mean(axis=1), 1)
+    overdue = rng.random(n_rows) < 1 / (1 + np.exp(0.8 * engagement))
+
+    ids = np.arange(start_id, start_id + n_rows).astype(str)
+    df = pd.DataFrame({
+        'student_id': np.char.add('S', ids),
+        'name': np.char.add('Student S', ids),
+        'prn': np.char.add('PRN', ids),
+        'fee_status': np.where(overdue, 'Overdue', 'Paid'),
+        'attendance_percentage': attendance,
+        'avgMarks': avg_marks,
+    })
+    for sem in range(1, 6):
+        df[f'sem{sem}_att'] = np.clip(np.rint(attendance + 3.5 * rng.standard_normal(n_rows)), 0, 100).astype(int)
+    # As in the sample data, the latest semester is the current attendance.
+    df['sem6_att'] = attendance
+    for sem in range(1, 7):
+        df[f'sem{sem}_cgpa'] = np.round(np.clip(avg_marks / 10 - 0.1 + 0.35 * rng.standard_normal(n_rows), 0, 10), 2)
+    df['credits'] = rng.integers(18, 25, n_rows)
+    df['wellbeing'] = np.clip(np.rint(62 + 9 * engagement + 9 * rng.standard_normal(n_rows)), 0, 100).astype(int)
+
+    template = ', '.join(f'{{{{"subject": "{subject}", "score": {{}}}}}}' for subject in SUBJECTS)
+    df['subjects_json'] = ['[' + template.format(*row) + ']' for row in scores.tolist()]
+    return df[STUDENT_COLUMNS + ['subjects_json']], scores
+
+
+def to_upload_rows(df: pd.DataFrame, scores: np.ndarray) -> pd.DataFrame:
+    """Long format accepted by /api/upload: one row per student, subject and test."""
+    n_rows = len(df)
+    return pd.DataFrame({
+        'student_id': np.repeat(df['student_id'].to_numpy(), len(SUBJECTS)),
+        'attendance_percentage': np.repeat(df['attendance_percentage'].to_numpy(), len(SUBJECTS)),
+        'fee_status': np.repeat(df['fee_status'].to_numpy(), len(SUBJECTS)),
+        'subject': np.tile(SUBJECTS, n_rows),
+        'test_score': scores.reshape(-1),
+        'test_number': np.tile(np.arange(1, len(SUBJECTS) + 1), n_rows),
+    })[UPLOAD_COLUMNS]
+
+
+def write_csv(path: str, n_rows: int, start_id: int = 1000, seed: int = 42, upload_format: bool = False,
+              chunk_rows: int = GEN_CHUNK_ROWS) -> int:
+    """Write n_rows synthetic students to path in chunks; returns rows written."""
+    written = 0
+    for chunk_start in range(0, n_rows, chunk_rows):
+        size = min(chunk_rows, n_rows - chunk_start)
+        df, scores = generate_students(size, start_id + chunk_start, seed + chunk_start)
+        if upload_format:
+            df = to_upload_rows(df, scores)
+        df.to_csv(path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += len(df)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic student data shaped like students_data.csv.")
+    parser.add_argument('rows', type=int, help="number of students, e.g. 1000, 100000, 1000000")
+    parser.add_argument('-o', '--output', help="CSV path (default students_<rows>.csv)")
+    parser.add_argument('--start-id', type=int, default=1000, help="first numeric student id (S<n>)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--upload', action='store_true',
+                        help="write the long /api/upload format instead of the db_setup.py format")
+    args = parser.parse_args()
+
+    output = args.output or f"students_{args.rows}.csv"
+    if os.path.exists(output):
+        print(f"❌ {output} already exists.")
+        return
+    written = write_csv(output, args.rows, args.start_id, args.seed, args.upload)
+    print(f"✅ Wrote {written:,} rows to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import os
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+bind = f"{os.environ.get('WEB_HOST', '127.0.0.1')}:{os.environ.get('WEB_PORT', '5000')}"
+workers = int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1))
+threads = int(os.environ.get('WEB_THREADS', '4'))
+worker_class = 'gthread'
+# Load the app (model, cohort snapshot, shared data version) once in the
+# master before forking; see wsgi.py.
+preload_app = True
+keepalive = 5
+timeout = int(os.environ.get('WEB_TIMEOUT', '120'))
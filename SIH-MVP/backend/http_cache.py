@@ -0,0 +1,96 @@
+import functools
+import hashlib
+import multiprocessing
+import time
+import uuid
+from datetime import datetime, timezone
+
+from flask import make_response, request
+
+
+class DataVersion:
+    """Counter bumped by every write that changes what readers see.
+
+    The ETag is "<epoch>-<counter>"; the random epoch keeps a restarted
+    server from reusing tags a client cached from the previous process.
+    State lives in shared memory, so when it is created before the server
+    forks (gunicorn --preload) every worker sees every other worker's
+    writes and hands out the same tags.
+    """
+
+    def __init__(self):
+        self._lock = multiprocessing.Lock()
+        self._epoch = uuid.uuid4().hex[:8]
+        # [counter, last-modified as a POSIX timestamp]
+        self._state = multiprocessing.RawArray('q', 2)
+        self._state[1] = int(time.time())
+
+    def bump(self) -> int:
+        """Record a write; returns the new counter."""
+        with self._lock:
+            self._state[0] += 1
+            # The real commit time, never pushed ahead of the clock: writes
+            # within one second share a Last-Modified and are told apart by
+            # the ETag, which clients send as If-None-Match in preference.
+            self._state[1] = int(time.time())
+            return self._state[0]
+
+    @property
+    def counter(self) -> int:
+        return self._state[0]
+
+    def tag(self, counter: int) -> str:
+        """The ETag value for a given counter."""
+        return f"{self._epoch}-{counter}"
+
+    def current(self):
+        """Return (etag, last_modified) as one consistent pair."""
+        with self._lock:
+            counter, modified = self._state[0], self._state[1]
+        return self.tag(counter), datetime.fromtimestamp(modified, timezone.utc)
+
+
+def conditional(data_version: DataVersion, scope=None, vary=()):
+    """Serve the view with ETag/Last-Modified and answer revalidation with 304.
+
+    The version is read before the view runs, so a write racing with the
+    request can only make the tag older than the body (costing one extra
+    200 later), never newer. The tags are weak: compressed and plain bodies
+    share one. If-Modified-Since is only a fallback for clients that send
+    no If-None-Match.
+
+    For per-user views, `scope()` returns what the body depends on besides
+    the data (e.g. the session's username); a hash of it is folded into the
+    ETag. `vary` headers are set on every response, 304s included.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag, modified = data_version.current()
+            # Last-Modified has one-second resolution: while its second is
+            # still running another write can land in it unseen, so it is
+            # neither sent nor trusted until that second is over.
+            settled = modified.timestamp() < int(time.time())
+            if scope is not None:
+                etag = f"{etag}-{hashlib.sha256(str(scope()).encode()).hexdigest()[:16]}"
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = settled and since is not None and since >= modified
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+            for header in vary:
+                response.vary.add(header)
+            if response.status_code not in (200, 304):
+                return response
+            response.set_etag(etag, weak=True)
+            if settled:
+                response.last_modified = modified
+            # Cache, but revalidate on every use.
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
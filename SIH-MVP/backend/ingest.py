@@ -0,0 +1,108 @@
+import os
+
+import pandas as pd
+
+from db import transaction
+
+UPLOAD_CHUNK_ROWS = int(os.environ.get('UPLOAD_CHUNK_ROWS', '50000'))
+REQUIRED_UPLOAD_COLUMNS = ['student_id', 'attendance_percentage', 'fee_status', 'subject', 'test_score', 'test_number']
+STUDENT_COLUMNS = ['student_id', 'attendance_percentage', 'fee_status']
+SCORE_COLUMNS = ['student_id', 'subject', 'test_number', 'test_score']
+
+# SQLite's default limit on bound parameters is 999 on older builds.
+LOOKUP_BATCH = 500
+
+
+class UploadError(ValueError):
+    """The upload is malformed (e.g. missing required columns)."""
+
+
+def _existing_ids(conn, student_ids, max_rowid):
+    """Return the subset of student_ids in the students table with rowid <= max_rowid (PK lookups)."""
+    found = set()
+    for start in range(0, len(student_ids), LOOKUP_BATCH):
+        batch = student_ids[start:start + LOOKUP_BATCH]
+        placeholders = ", ".join("?" * len(batch))
+        found.update(row[0] for row in conn.execute(
+            f"SELECT student_id FROM students WHERE student_id IN ({placeholders}) AND rowid <= ?",
+            batch + [max_rowid]
+        ))
+    return found
+
+
+def rows_for_insert(df, columns) -> list:
+    """df's columns as a list of tuples for executemany.
+
+    Series.tolist() yields Python scalars, which sqlite3 can bind directly.
+    """
+    return list(zip(*(df[col].tolist() for col in columns)))
+
+
+def ingest_csv_stream(stream, chunk_rows: int = UPLOAD_CHUNK_ROWS, progress=None) -> dict:
+    """Load an upload CSV (one row per student/subject/test) in bounded chunks.
+
+    Students already in the DB before the upload are skipped, matching the
+    old all-in-memory behaviour; students first seen in this upload keep
+    receiving score rows from later chunks. Each chunk is inserted with
+    executemany in its own transaction, and `progress(stats)` is called
+    after every chunk.
+
+    "Before the upload" is the students rowid high-water mark taken with the
+    first chunk, so memory stays bounded however many new students the
+    stream holds. A student another writer adds mid-upload is above the mark
+    too and is loaded like one of ours. rows_read is every CSV row; it is
+    the sum of the rows_skipped_* counts, scores_added and scores_duplicate.
+    """
+    stats = {
+        'chunks': 0,
+        'rows_read': 0,
+        'rows_skipped_missing_id': 0,
+        'rows_skipped_existing': 0,
+        'students_added': 0,
+        'scores_added': 0,
+        'scores_duplicate': 0,
+    }
+    max_rowid = None
+
+    reader = pd.read_csv(stream, chunksize=chunk_rows, encoding='utf-8', dtype={'student_id': str})
+    for chunk in reader:
+        if stats['chunks'] == 0:
+            missing = [col for col in REQUIRED_UPLOAD_COLUMNS if col not in chunk.columns]
+            if missing:
+                raise UploadError(f"Missing required columns: {missing}")
+
+        rows_read = len(chunk)
+        chunk = chunk.dropna(subset=['student_id'])
+        chunk_ids = chunk['student_id'].unique().tolist()
+
+        with transaction() as conn:
+            if max_rowid is None:
+                max_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM students").fetchone()[0]
+            existing = _existing_ids(conn, chunk_ids, max_rowid)
+            keep = chunk[~chunk['student_id'].isin(existing)]
+
+            # Students from earlier chunks are already in; rowcount counts only new ones.
+            students_added = conn.executemany(
+                "INSERT OR IGNORE INTO students (student_id, attendance_percentage, fee_status) VALUES (?, ?, ?)",
+                rows_for_insert(keep.drop_duplicates('student_id'), STUDENT_COLUMNS)
+            ).rowcount
+
+            # rowcount excludes the subject_stats trigger writes and rows
+            # ignored by the (student_id, subject, test_number) unique index.
+            scores_added = conn.executemany(
+                "INSERT OR IGNORE INTO test_scores (student_id, subject, test_number, test_score) "
+                "VALUES (?, ?, ?, ?)",
+                rows_for_insert(keep, SCORE_COLUMNS)
+            ).rowcount
+
+        stats['chunks'] += 1
+        stats['rows_read'] += rows_read
+        stats['rows_skipped_missing_id'] += rows_read - len(chunk)
+        stats['rows_skipped_existing'] += len(chunk) - len(keep)
+        stats['students_added'] += students_added
+        stats['scores_added'] += scores_added
+        stats['scores_duplicate'] += len(keep) - scores_added
+        if progress:
+            progress(dict(stats))
+
+    return stats
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# Reason codes, OR-ed into one small integer per student.
+LOW_ATTENDANCE = 1
+LOW_SCORE = 2
+FEE_OVERDUE = 4
+
+# Fallbacks for thresholds missing from the counseling_thresholds table.
+DEFAULT_THRESHOLDS = {
+    'attendance_min': 75.0,
+    'avg_score_min': 50.0,
+}
+
+DEFAULT_ADVICE = "No specific advice. The student's data looks good."
+
+
+def load_thresholds(conn) -> dict:
+    """Read the counseling thresholds, falling back to DEFAULT_THRESHOLDS."""
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    thresholds.update(conn.execute("SELECT name, value FROM counseling_thresholds").fetchall())
+    return thresholds
+
+
+def reason_codes(attendance, avg_score, fee_status, thresholds=DEFAULT_THRESHOLDS) -> np.ndarray:
+    """Evaluate every rule as a boolean mask over the cohort; returns a uint8 bitmask per row.
+
+    Missing values never trigger a rule.
+    """
+    attendance = np.asarray(attendance, dtype=np.float64)
+    avg_score = np.asarray(avg_score, dtype=np.float64)
+    overdue = pd.Series(fee_status, copy=False).astype(str).str.lower().eq('overdue').to_numpy()
+
+    codes = np.zeros(attendance.shape[0], dtype=np.uint8)
+    codes[attendance < thresholds['attendance_min']] |= LOW_ATTENDANCE
+    codes[avg_score < thresholds['avg_score_min']] |= LOW_SCORE
+    codes[overdue] |= FEE_OVERDUE
+    return codes
+
+
+def render_insights(code: int, attendance, avg_score):
+    """Turn one row's reason code back into (reasons, advice) text."""
+    reasons = []
+    advice = DEFAULT_ADVICE
+
+    if code & LOW_ATTENDANCE:
+        reasons.append(f"Low attendance ({attendance}%).")
+        advice = "Encourage regular class attendance. "
+
+    if code & LOW_SCORE:
+        reasons.append(f"Low average test score ({avg_score}).")
+        advice += "Suggest tutoring or extra practice. "
+
+    if code & FEE_OVERDUE:
+        reasons.append("Overdue fee status.")
+        advice += "Consider financial counseling."
+
+    return reasons, advice
+
+
+def render_rows(codes, attendance, avg_score):
+    """(reasons, advice) lists for a set of rows, from their reason codes.
+
+    Only call this on the rows actually being returned.
+    """
+    reasons, advice = [], []
+    for code, row_attendance, row_avg_score in zip(list(codes), list(attendance), list(avg_score)):
+        row_reasons, row_advice = render_insights(0 if pd.isna(code) else int(code), row_attendance, row_avg_score)
+        reasons.append(row_reasons)
+        advice.append(row_advice)
+    return reasons, advice
+
+
+def get_counseling_insights(student_data, model=None, features=None, thresholds=DEFAULT_THRESHOLDS):
+    """Reasons and advice for a single student dict."""
+    code = reason_codes(
+        [student_data['attendance_percentage']],
+        [student_data['avg_test_score']],
+        [student_data['fee_status'] or ''],
+        thresholds
+    )[0]
+    return render_insights(int(code), student_data['attendance_percentage'], student_data['avg_test_score'])
@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from db import connection, transaction
+from ingest import ingest_csv_stream
+
+# One ingest at a time by default: SQLite has a single writer, so a second
+# concurrent upload would only wait on the write lock.
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', '1'))
+# Uploads up to this size stay in memory; larger ones spill to a temp file.
+UPLOAD_SPOOL_BYTES = int(os.environ.get('UPLOAD_SPOOL_BYTES', str(8 * 1024 * 1024)))
+# Finished jobs are forgotten after this many days.
+JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', '7'))
+
+STAT_COLUMNS = ['chunks', 'rows_read', 'rows_skipped_missing_id', 'rows_skipped_existing', 'students_added', 'scores_added', 'scores_duplicate']
+JOB_COLUMNS = ['job_id', 'filename', 'state', *STAT_COLUMNS, 'error', 'created_at', 'started_at', 'finished_at']
+
+
+def _now(offset_seconds: float = 0.0) -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time() + offset_seconds))
+
+
+def spool_upload(stream, max_size: int = UPLOAD_SPOOL_BYTES):
+    """Copy a request's file stream into a temp file that outlives the request."""
+    spool = tempfile.SpooledTemporaryFile(max_size=max_size)
+    shutil.copyfileobj(stream, spool, 1024 * 1024)
+    spool.seek(0)
+    return spool
+
+
+def fail_interrupted_jobs(conn) -> int:
+    """Mark jobs left queued or running by a previous server as failed.
+
+    Their spooled files died with that process. Call once at startup,
+    before any worker accepts uploads.
+    """
+    return conn.execute(
+        "UPDATE upload_jobs SET state = 'failed', error = 'Server restarted before the upload finished.', "
+        "finished_at = ? WHERE state IN ('queued', 'running')",
+        (_now(),)
+    ).rowcount
+
+
+class UploadJobs:
+    """Runs CSV uploads on a background pool, tracking each one in upload_jobs.
+
+    Progress lives in the database rather than in memory, so any worker
+    process can answer a status request. `on_chunk(stats)` is called after
+    each chunk that committed new rows and `on_done(stats)` once per job,
+    also when it failed partway.
+    """
+
+    def __init__(self, on_chunk=None, on_done=None, workers: int = UPLOAD_WORKERS):
+        self._on_chunk = on_chunk
+        self._on_done = on_done
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upload')
+
+    def submit(self, spool, filename: str) -> str:
+        """Queue a spooled upload; returns its job id."""
+        job_id = uuid.uuid4().hex
+        with transaction() as conn:
+            conn.execute(
+                "DELETE FROM upload_jobs WHERE finished_at < ?",
+                (_now(-JOB_RETENTION_DAYS * 86400),)
+            )
+            conn.execute(
+                "INSERT INTO upload_jobs (job_id, filename, state, created_at) VALUES (?, ?, 'queued', ?)",
+                (job_id, filename, _now())
+            )
+        try:
+            self._executor.submit(self._run, job_id, spool)
+        except RuntimeError as e:
+            spool.close()
+            self._finish(job_id, 'failed', {}, str(e))
+            raise
+        return job_id
+
+    def get(self, job_id: str):
+        """The job as a dict, or None if unknown."""
+        with connection() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM upload_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return dict(zip(JOB_COLUMNS, row)) if row is not None else None
+
+    def _record(self, job_id: str, stats: dict):
+        assignments = ", ".join(f"{col} = ?" for col in STAT_COLUMNS)
+        with transaction() as conn:
+            conn.execute(
+                f"UPDATE upload_jobs SET {assignments} WHERE job_id = ?",
+                [stats.get(col, 0) for col in STAT_COLUMNS] + [job_id]
+            )
+
+    def _finish(self, job_id: str, state: str, stats: dict, error: str = None):
+        assignments = ", ".join(f"{col} = ?" for col in STAT_COLUMNS)
+        with transaction() as conn:
+            conn.execute(
+                f"UPDATE upload_jobs SET state = ?, error = ?, finished_at = ?, {assignments} WHERE job_id = ?",
+                [state, error, _now()] + [stats.get(col, 0) for col in STAT_COLUMNS] + [job_id]
+            )
+
+    def _run(self, job_id: str, spool):
+        with transaction() as conn:
+            conn.execute("UPDATE upload_jobs SET state = 'running', started_at = ? WHERE job_id = ?",
+                         (_now(), job_id))
+        last = {col: 0 for col in STAT_COLUMNS}
+
+        def progress(stats):
+            changed = (stats['students_added'] > last['students_added']
+                       or stats['scores_added'] > last['scores_added'])
+            last.update(stats)
+            self._record(job_id, stats)
+            if changed and self._on_chunk:
+                self._on_chunk(stats)
+
+        try:
+            with spool:
+                stats = ingest_csv_stream(spool, progress=progress)
+        except Exception as e:
+            # Chunks before the failure stay committed.
+            self._finish(job_id, 'failed', last, str(e))
+            print(f"❌ Upload job {job_id} failed: {e}")
+            if self._on_done:
+                self._on_done(dict(last))
+            return
+        self._finish(job_id, 'done', stats)
+        if self._on_done:
+            self._on_done(stats)
@@ -0,0 +1,123 @@
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+
+# Starts gunicorn (gunicorn.conf.py + wsgi:app) with 1, 2, 4, ... workers and
+# drives it from several client processes over keep-alive connections,
+# reporting requests/sec and latency per worker count. GET-only, so it can
+# be pointed at a real database.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _worker_counts(max_workers: int) -> list:
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(port: int, path: str, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', path)
+            conn.getresponse().read()
+            conn.close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def _client(args):
+    """One client process: request `path` back-to-back for `duration` seconds."""
+    port, path, duration = args
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    return latencies, errors
+
+
+def run_level(workers: int, threads: int, clients: int, path: str, duration: float) -> dict:
+    port = _free_port()
+    env = dict(os.environ, WEB_WORKERS=str(workers), WEB_THREADS=str(threads),
+               WEB_HOST='127.0.0.1', WEB_PORT=str(port), FAST_STARTUP='0')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning', 'wsgi:app'],
+        cwd=HERE, env=env
+    )
+    try:
+        if not _wait_ready(port, path, timeout=120):
+            raise RuntimeError(f"gunicorn with {workers} worker(s) did not come up on port {port}")
+        with Pool(clients) as pool:
+            results = pool.map(_client, [(port, path, duration)] * clients)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    latencies = sorted(lat for lats, _ in results for lat in lats)
+    errors = sum(err for _, err in results)
+    n = len(latencies)
+    return {
+        'workers': workers,
+        'requests': n,
+        'errors': errors,
+        'req_per_sec': n / duration,
+        'p50_ms': latencies[n // 2] * 1000 if n else 0.0,
+        'p99_ms': latencies[min(n - 1, int(n * 0.99))] * 1000 if n else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API throughput under gunicorn at increasing worker counts.")
+    parser.add_argument('--path', default='/api/students?limit=100')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, default=4, help="threads per worker (WEB_THREADS)")
+    parser.add_argument('--clients', type=int, default=2 * (os.cpu_count() or 1),
+                        help="concurrent client processes")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per worker count")
+    args = parser.parse_args()
+
+    print(f"GET {args.path}  clients={args.clients}  threads/worker={args.threads}  {args.duration:.0f}s per run")
+    print(f"{'workers':>7} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    baseline = None
+    for workers in _worker_counts(args.max_workers):
+        stats = run_level(workers, args.threads, args.clients, args.path, args.duration)
+        baseline = baseline or stats['req_per_sec']
+        scale = stats['req_per_sec'] / baseline if baseline else 0.0
+        print(f"{stats['workers']:>7} {stats['req_per_sec']:>10,.0f} {stats['p50_ms']:>9.1f} "
+              f"{stats['p99_ms']:>9.1f} {stats['errors']:>7}   x{scale:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,29 @@
 import os
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, Response, jsonify, request, render_template, send_file
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 import sqlite3
-import io
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from werkzeug.security import generate_password_hash, check_password_hash
-import joblib
+import math
+import threading
+from db import connection, transaction
+from migrations import migrate
+from jobs import UploadJobs, fail_interrupted_jobs, spool_upload
+from werkzeug.security import generate_password_hash
+from auth import (SESSION_MAX_AGE, Overloaded, PasswordVerifier, current_session, issue_token,
+                  overloaded_response, require_session)
+from features import score_frame
+from insights import DEFAULT_THRESHOLDS, load_thresholds, render_insights, render_rows
+from risk_scores import RescoreWorker
+from trends import TrendService, as_points, by_subject
+from training import TrainingRunner, bundle_stamp, fit_artifacts, load_artifacts, new_version, save_artifacts
+from search import search_student_ids
+from serialization import dumps, frame_to_json, json_response
+from http_cache import DataVersion, conditional
+from metrics import CONTENT_TYPE, METRICS, span
+from snapshot import MIMETYPES, SNAPSHOT_FILES, SnapshotWriter
+from pagination import (DEFAULT_PAGE_SIZE, build_sort_orders, decode_cursor, keyset_page,
+                        parse_limit, parse_sort)
 
 # Set up Flask
 app = Flask(
@@ -16,21 +31,21 @@ app = Flask(
     template_folder=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
 )
 # Allow all origins (fix for frontend fetch issues)
-CORS(app)
-
-# Historical data (used only if DB is empty)
-historical_data = {
-    'student_id': ['101', '102', '103', '104', '105', '106', '107', '108', '109', '110'],
-    'attendance_percentage': [82, 65, 90, 72, 55, 95, 68, 85, 78, 62],
-    'avg_test_score': [81.5, 37.5, 90.0, 50.0, 32.0, 88.0, 55.0, 75.0, 60.0, 45.0],
-    'fee_status': ['Paid', 'Overdue', 'Paid', 'Overdue', 'Overdue', 'Paid', 'Overdue', 'Paid', 'Paid', 'Overdue'],
-    'risk_label': ['Low', 'High', 'Low', 'Medium', 'High', 'Low', 'High', 'Low', 'Medium', 'High']
-}
-historical_df = pd.DataFrame(historical_data)
-
-MODEL_FILE = 'risk_model.joblib'
-SCALER_FILE = 'scaler.joblib'
-ENCODER_FILE = 'encoder.joblib'
+CORS(app, expose_headers=['X-Total-Count', 'X-Next-Cursor', 'ETag', 'Last-Modified', 'Server-Timing'])
+
+# Bumped by every write to students/test_scores and by model swaps; read
+# endpoints use it as their ETag, so revalidation never touches SQLite.
+# It is shared with forked workers, and the per-process caches below
+# (risk store, trends) compare against it to notice other workers' writes.
+DATA_VERSION = DataVersion()
+
+# Recent students' score series, valid for one data version.
+TRENDS = TrendService(lambda: DATA_VERSION.counter)
+
+# Active model. ACTIVE_MODEL is replaced as a whole on retrain; prediction
+# code takes one reference to it so in-flight requests keep a consistent set.
+# MODEL/SCALER/ENCODER/FEATURES mirror it for existing callers.
+ACTIVE_MODEL = None
 MODEL = None
 SCALER = None
 ENCODER = None
@@ -38,143 +53,298 @@ FEATURES = None
 
 # -------------------- Database Helper --------------------
 def get_data_from_db():
-    conn = None
     try:
-        conn = sqlite3.connect('students.db')
-        students_df = pd.read_sql_query("SELECT * FROM students", conn)
-        test_scores_df = pd.read_sql_query("SELECT * FROM test_scores", conn)
-        
-        students_df['student_id'] = students_df['student_id'].astype(str)
-        test_scores_df['student_id'] = test_scores_df['student_id'].astype(str)
+        with span('db_read') as stage, connection() as conn:
+            students_df = pd.read_sql_query("SELECT * FROM students", conn)
+            test_scores_df = pd.read_sql_query("SELECT * FROM test_scores", conn)
+            stage.rows = len(students_df) + len(test_scores_df)
 
-        avg_scores_df = test_scores_df.groupby("student_id")['test_score'].mean().reset_index()
-        avg_scores_df.rename(columns={"test_score": "avg_test_score"}, inplace=True)
+        with span('merge') as stage:
+            students_df['student_id'] = students_df['student_id'].astype(str)
+            test_scores_df['student_id'] = test_scores_df['student_id'].astype(str)
 
-        merged_df = pd.merge(students_df, avg_scores_df, on='student_id', how='left')
-        merged_df['avg_test_score'] = merged_df['avg_test_score'].fillna(0)
+            avg_scores_df = test_scores_df.groupby("student_id")['test_score'].mean().reset_index()
+            avg_scores_df.rename(columns={"test_score": "avg_test_score"}, inplace=True)
+
+            merged_df = pd.merge(students_df, avg_scores_df, on='student_id', how='left')
+            merged_df['avg_test_score'] = merged_df['avg_test_score'].fillna(0)
+            stage.rows = len(merged_df)
         
         return merged_df, test_scores_df, None
     except sqlite3.Error as e:
         return pd.DataFrame(), pd.DataFrame(), f"Database connection error: {e}"
-    finally:
-        if conn:
-            conn.close()
 
-# -------------------- AI Model --------------------
-from xgboost import XGBClassifier
-import joblib
-import numpy as np
-import pandas as pd
-import os
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+STUDENT_ROW_SQL = """
+    SELECT s.*, COALESCE(AVG(t.test_score), 0) AS avg_test_score,
+           r.high_risk_prob, r.risk_level, r.reason_codes
+    FROM students s
+    LEFT JOIN test_scores t ON t.student_id = s.student_id
+    LEFT JOIN risk_scores r ON r.student_id = s.student_id
+    WHERE s.student_id = ?
+    GROUP BY s.student_id
+"""
+
+def fetch_student(student_id):
+    """Point lookup of one student's merged row, stored score and test scores (no full-table reads)."""
+    with span('db_read') as stage, connection() as conn:
+        cursor = conn.execute(STUDENT_ROW_SQL, (student_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None, []
+        columns = [col[0] for col in cursor.description]
+
+        cursor = conn.execute(
+            "SELECT * FROM test_scores WHERE student_id = ? ORDER BY test_number",
+            (student_id,)
+        )
+        score_columns = [col[0] for col in cursor.description]
+        scores = [dict(zip(score_columns, score)) for score in cursor.fetchall()]
+        stage.rows = 1 + len(scores)
+
+    student = dict(zip(columns, row))
+    student['student_id'] = str(student['student_id'])
+    return student, scores
 
 # -------------------- AI Model --------------------
+# sklearn/xgboost are only imported when training (training.fit_artifacts)
+# or when a bundle holds a booster; importing this module stays cheap.
+MODEL_SWAP_LOCK = threading.Lock()
+MODEL_LOAD_LOCK = threading.Lock()
+# mtime of the bundle ACTIVE_MODEL came from; a newer bundle means another
+# worker process retrained.
+MODEL_STAMP = None
+
+def activate_model(artifacts):
+    """Atomically install a new set of model artifacts."""
+    global ACTIVE_MODEL, MODEL, SCALER, ENCODER, FEATURES, MODEL_STAMP
+    with MODEL_SWAP_LOCK:
+        ACTIVE_MODEL = artifacts
+        MODEL, SCALER, ENCODER, FEATURES = artifacts.model, artifacts.scaler, artifacts.encoder, artifacts.features
+        MODEL_STAMP = bundle_stamp()
+
 def train_model_once():
-    global MODEL, SCALER, ENCODER, FEATURES
-
-    if os.path.exists(MODEL_FILE) and os.path.exists(SCALER_FILE) and os.path.exists(ENCODER_FILE):
-        MODEL = joblib.load(MODEL_FILE)
-        SCALER = joblib.load(SCALER_FILE)
-        ENCODER = joblib.load(ENCODER_FILE)
-        FEATURES = ['attendance_percentage', 'avg_test_score'] + ENCODER.get_feature_names_out(['fee_status']).tolist()
-        print("✅ AI model loaded successfully (XGBoost).")
+    artifacts = load_artifacts()
+    if artifacts is not None:
+        activate_model(artifacts)
+        print(f"✅ AI model loaded successfully (version {artifacts.version}).")
         return
 
     print("⚠️ Training a new AI model (XGBoost)...")
     train_df, _, _ = get_data_from_db()
-
-    if train_df.empty:
-        train_df = historical_df.copy()
-
-    # Create labels if missing
-    if 'risk_label' not in train_df.columns:
-        def get_label(row):
-            if row['attendance_percentage'] < 70 and row['avg_test_score'] < 50:
-                return 'High'
-            elif row['attendance_percentage'] < 80 or row['avg_test_score'] < 60 or row['fee_status'] == 'Overdue':
-                return 'Medium'
-            else:
-                return 'Low'
-        train_df['risk_label'] = train_df.apply(get_label, axis=1)
-
-    # Encode categorical
-    ENCODER = OneHotEncoder(handle_unknown='ignore')
-    train_encoded = pd.DataFrame(
-        ENCODER.fit_transform(train_df[['fee_status']]).toarray(),
-        columns=ENCODER.get_feature_names_out(['fee_status'])
-    )
-
-    train_df_processed = pd.concat([train_df.drop('fee_status', axis=1), train_encoded], axis=1)
-
-    FEATURES = ['attendance_percentage', 'avg_test_score'] + ENCODER.get_feature_names_out(['fee_status']).tolist()
-    X_train = train_df_processed[FEATURES]
-    y_train = train_df_processed['risk_label']
-
-    # Scale numerical features
-    SCALER = StandardScaler()
-    X_train_scaled = SCALER.fit_transform(X_train)
-
-    # 🔹 Train XGBoost Classifier
-    MODEL = XGBClassifier(
-        n_estimators=200,
-        learning_rate=0.1,
-        max_depth=5,
-        random_state=42,
-        use_label_encoder=False,
-        eval_metric="mlogloss"
-    )
-    MODEL.fit(X_train_scaled, y_train)
-
-    # Save trained components
-    joblib.dump(MODEL, MODEL_FILE)
-    joblib.dump(SCALER, SCALER_FILE)
-    joblib.dump(ENCODER, ENCODER_FILE)
+    artifacts = fit_artifacts(train_df, new_version())
+    save_artifacts(artifacts)
+    activate_model(artifacts)
     print("✅ XGBoost AI model trained and saved.")
 
+def _model_outdated():
+    stamp = bundle_stamp()
+    return ACTIVE_MODEL is None or (stamp is not None and stamp != MODEL_STAMP)
 
-def predict_risk(current_df):
-    if MODEL is None or SCALER is None or ENCODER is None:
-        return current_df, "AI model not loaded. Restart server."
+def get_model():
+    """Return the active artifacts, loading (or training) them on first use.
 
-    current_encoded = pd.DataFrame(
-        ENCODER.transform(current_df[['fee_status']]).toarray(),
-        columns=ENCODER.get_feature_names_out(['fee_status'])
-    )
+    Also reloads the bundle when another process has replaced it.
+    """
+    if _model_outdated():
+        with MODEL_LOAD_LOCK:
+            if _model_outdated():
+                train_model_once()
+    return ACTIVE_MODEL
 
-    current_df_processed = pd.concat([current_df.drop('fee_status', axis=1), current_encoded], axis=1)
-    
-    X_predict = current_df_processed[FEATURES]
-    X_predict_scaled = SCALER.transform(X_predict)
-
-    predictions = MODEL.predict_proba(X_predict_scaled)
+def _on_model_trained(artifacts):
+    activate_model(artifacts)
+    # Rescore everyone with the new model before readers ask for it.
+    build_risk_store()
+    record_write()
 
-    class_order = ['High', 'Medium', 'Low']
-    class_map = {cls: predictions[:, np.where(MODEL.classes_ == cls)[0][0]]
-                 for cls in class_order if cls in MODEL.classes_}
+TRAINER = TrainingRunner(lambda: get_data_from_db()[0], _on_model_trained)
 
-    current_df['high_risk_prob'] = class_map.get('High', np.zeros(len(current_df)))
-    current_df['risk_level'] = MODEL.predict(X_predict_scaled)
+# Scores live in risk_scores. Triggers queue students whose inputs change;
+# RESCORER scores only those, plus everyone once per new model version.
+RESCORER = RescoreWorker(get_model)
 
-    return current_df, None
 
+def predict_risk(current_df):
+    artifacts = get_model()
+    if artifacts is None:
+        return current_df, "AI model not loaded. Restart server."
 
-def get_counseling_insights(student_data, model, features):
-    reasons = []
-    advice = "No specific advice. The student's data looks good."
+    high_risk_prob, risk_level = score_frame(artifacts, current_df)
+    current_df['high_risk_prob'] = high_risk_prob
+    current_df['risk_level'] = risk_level
 
-    if student_data['attendance_percentage'] < 75:
-        reasons.append(f"Low attendance ({student_data['attendance_percentage']}%).")
-        advice = "Encourage regular class attendance. "
+    return current_df, None
 
-    if student_data['avg_test_score'] < 50:
-        reasons.append(f"Low average test score ({student_data['avg_test_score']}).")
-        advice += "Suggest tutoring or extra practice. "
 
-    if student_data['fee_status'].lower() == 'overdue':
-        reasons.append("Overdue fee status.")
-        advice += "Consider financial counseling."
+def refresh_score(student):
+    """Replace a fetched student's stored score with a current one if it is stale.
 
-    return reasons, advice
+    Only this student is scored (in memory); the rescore queue is left to
+    the background worker. Returns an error message or None.
+    """
+    scores_df, error = RESCORER.current_scores(pd.DataFrame([student]))
+    if error:
+        return error
+    score = scores_df.iloc[0]
+    student['high_risk_prob'] = float(score['high_risk_prob'])
+    student['risk_level'] = str(score['risk_level'])
+    student['reason_codes'] = int(score['reason_codes'])
+    return None
+
+
+# -------------------- Risk Score Store --------------------
+# Scored cohort kept in memory so list reads never hit SQLite or the model.
+# Writers build a new DataFrame and swap it in; readers keep whatever snapshot
+# they grabbed.
+RISK_STORE_LOCK = threading.RLock()
+# 'version' is the DATA_VERSION counter the snapshot reflects.
+RISK_STORE = {'df': None, 'index': {}, 'by_level': {}, 'orders': {}, 'version': None}
+
+def _set_risk_store(final_df):
+    final_df = final_df.reset_index(drop=True)
+    index = {sid: pos for pos, sid in enumerate(final_df['student_id'])}
+    by_level = {}
+    if 'risk_level' in final_df.columns:
+        by_level = {str(level).lower(): positions
+                    for level, positions in final_df.groupby('risk_level').indices.items()}
+    orders = build_sort_orders(final_df) if 'student_id' in final_df.columns else {}
+    RISK_STORE['df'] = final_df
+    RISK_STORE['index'] = index
+    RISK_STORE['by_level'] = by_level
+    RISK_STORE['orders'] = orders
+    return final_df
+
+def build_risk_store():
+    """Load the cohort joined with its scores, replacing the cached snapshot.
+
+    Stored scores are used where current; only students still queued for
+    rescoring go through the model, in memory (see RescoreWorker.current_scores).
+    """
+    with RISK_STORE_LOCK:
+        # Read before loading: a write landing mid-build leaves the snapshot
+        # marked stale rather than wrongly current.
+        version = DATA_VERSION.counter
+        merged_df, _, error = get_data_from_db()
+        if error:
+            return None, error
+        if merged_df.empty:
+            RISK_STORE['version'] = version
+            return _set_risk_store(merged_df), None
+
+        scores_df, model_error = RESCORER.current_scores(merged_df)
+        if model_error:
+            return None, model_error
+        with span('merge') as stage:
+            final_df = merged_df.merge(scores_df, on='student_id', how='left')
+            RISK_STORE['version'] = version
+            stage.rows = len(final_df)
+            return _set_risk_store(final_df), None
+
+def get_risk_store():
+    """Return the scored cohort snapshot, (re)building it when missing or stale.
+
+    It is stale after a write this process has not applied, e.g. one made
+    by another worker.
+    """
+    with RISK_STORE_LOCK:
+        if RISK_STORE['df'] is not None and RISK_STORE['version'] == DATA_VERSION.counter:
+            return RISK_STORE['df'], None
+        return build_risk_store()
+
+def record_write():
+    """Bump DATA_VERSION after a write this process has applied to its snapshot.
+
+    The snapshot stays current only if nothing else was written since it
+    was last current.
+    """
+    with RISK_STORE_LOCK:
+        version = DATA_VERSION.bump()
+        if RISK_STORE['version'] == version - 1:
+            RISK_STORE['version'] = version
+    SNAPSHOTS.wake()
+
+def invalidate_risk_store():
+    with RISK_STORE_LOCK:
+        RISK_STORE['df'] = None
+        RISK_STORE['index'] = {}
+        RISK_STORE['by_level'] = {}
+        RISK_STORE['orders'] = {}
+
+def patch_risk_store(student_id):
+    """Swap this student's updated, currently scored row into the snapshot.
+
+    Called after the write is committed, so it never raises: if the row
+    cannot be patched the snapshot is dropped and rebuilt on the next read.
+    """
+    student_id = str(student_id)
+    with RISK_STORE_LOCK:
+        current_df = RISK_STORE['df']
+        if current_df is None:
+            return
+        try:
+            student, _ = fetch_student(student_id)
+            if student is None:
+                drop_from_risk_store(student_id)
+                return
+            if refresh_score(student):
+                invalidate_risk_store()
+                return
+
+            # A one-row frame concatenated in place of the old row, so an
+            # edited value of another type (72.5 into an int column) upcasts
+            # the column instead of failing a setitem.
+            row = pd.DataFrame([student])[current_df.columns]
+            pos = RISK_STORE['index'].get(student_id)
+            if pos is None:
+                new_df = pd.concat([current_df, row], ignore_index=True)
+            else:
+                new_df = pd.concat([current_df.iloc[:pos], row, current_df.iloc[pos + 1:]], ignore_index=True)
+            _set_risk_store(new_df)
+        except Exception as e:
+            print(f"⚠️ Could not patch student {student_id} into the risk store: {e}")
+            invalidate_risk_store()
+
+def drop_from_risk_store(student_id):
+    with RISK_STORE_LOCK:
+        current_df = RISK_STORE['df']
+        pos = RISK_STORE['index'].get(str(student_id))
+        if current_df is None or pos is None:
+            return
+        _set_risk_store(current_df.drop(index=pos))
+
+# -------------------- Cohort snapshots --------------------
+# The scored cohort as Arrow IPC (memory-mappable) and Parquet files under
+# SNAPSHOT_DIR, rewritten in the background after each change; see snapshot.py.
+def _snapshot_source():
+    with RISK_STORE_LOCK:
+        df, error = get_risk_store()
+        if error:
+            return None, None
+        return df, DATA_VERSION.tag(RISK_STORE['version'])
+
+SNAPSHOTS = SnapshotWriter(_snapshot_source)
+
+# -------------------- Upload jobs --------------------
+def _on_upload_chunk(stats):
+    # Each chunk is committed as it lands; make it visible to readers.
+    invalidate_risk_store()
+    record_write()
+
+def _on_upload_done(stats):
+    if stats['students_added']:
+        RESCORER.wake()
+        TRAINER.record_new_rows(stats['students_added'])
+
+UPLOADS = UploadJobs(on_chunk=_on_upload_chunk, on_done=_on_upload_done)
+
+# -------------------- Sessions --------------------
+# Logins verify the password once on the bounded hash pool and hand back a
+# signed token; later requests send `Authorization: Bearer <token>` and are
+# checked with one HMAC instead of another password hash.
+PASSWORDS = PasswordVerifier()
+
+def _session_payload(username, role):
+    return {'username': username, 'role': role, 'token': issue_token(username, role), 'expires_in': SESSION_MAX_AGE}
 
 # -------------------- Routes --------------------
 @app.route('/')
@@ -190,16 +360,23 @@ def login():
     if not username or not password:
         return jsonify({'message': 'Username and password required'}), 400
 
-    conn = sqlite3.connect('students.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT password, role FROM users WHERE username=?", (username,))
-    user_data = cursor.fetchone()
-    conn.close()
+    with connection() as conn:
+        user_data = conn.execute("SELECT password, role FROM users WHERE username=?", (username,)).fetchone()
 
-    if user_data and check_password_hash(user_data[0], password):
-        return jsonify({'message': 'Login successful', 'role': user_data[1], 'username': username}), 200
+    try:
+        valid = user_data is not None and PASSWORDS.verify(user_data[0], password)
+    except Overloaded as e:
+        return overloaded_response(e)
+    if valid:
+        return jsonify({'message': 'Login successful', **_session_payload(username, user_data[1])}), 200
     return jsonify({'message': 'Invalid credentials'}), 401
 
+@app.route("/api/session", methods=['GET'])
+@require_session()
+def get_session():
+    """Who the bearer token belongs to; 401 once it is missing, forged or expired."""
+    return jsonify(current_session())
+
 @app.route("/api/register", methods=['POST'])
 def register():
     data = request.json
@@ -210,77 +387,178 @@ def register():
     if not username or not password or not role:
         return jsonify({'message': 'All fields required'}), 400
 
-    conn = sqlite3.connect('students.db')
-    cursor = conn.cursor()
+    password_hash = generate_password_hash(password)
     try:
-        password_hash = generate_password_hash(password)
-        cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, password_hash, role))
-        conn.commit()
+        with transaction() as conn:
+            conn.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, password_hash, role))
         return jsonify({'message': 'User registered successfully!'}), 201
     except sqlite3.IntegrityError:
         return jsonify({'message': 'Username already exists.'}), 409
-    finally:
-        conn.close()
 
 @app.route("/api/students", methods=["GET"])
+@conditional(DATA_VERSION)
 def get_students():
-    merged_df, _, error = get_data_from_db()
+    """List scored students.
+
+    `search` matches student_id, name or PRN through the student_search
+    index; results come back best match first unless `sort` is given.
+    Optional query parameters, on top of `search` and `filter`:
+    `sort` (student_id, high_risk_prob, prefix '-' for descending),
+    `limit` and `cursor` for keyset paging (the next cursor is returned in
+    X-Next-Cursor, the filtered total in X-Total-Count), and `fields`, a
+    comma-separated list of columns to return. Without them the full list
+    is returned as before. `format=columns` returns
+    {"columns": [...], "data": [[column values], ...]} instead of row objects.
+    `insights=1` adds reasons/advice text, rendered for the returned rows only.
+    """
+    with RISK_STORE_LOCK:
+        final_df, error = get_risk_store()
+        by_level = RISK_STORE['by_level']
+        orders = RISK_STORE['orders']
+        index = RISK_STORE['index']
 
     if error:
-       
         return jsonify({"message": error}), 500
-    if merged_df.empty:
+    if final_df.empty:
         return jsonify({"message": "No data found."}), 404
 
-    final_df, model_error = predict_risk(merged_df)
-   
-    if model_error:
-        return jsonify({"message": model_error}), 500
-
     search_query = request.args.get('search', '').strip().lower()
     risk_filter = request.args.get('filter', '').strip().lower()
+    sort = request.args.get('sort', '').strip()
+    limit = request.args.get('limit', '').strip()
+    cursor = request.args.get('cursor', '').strip()
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+    orient = request.args.get('format', 'records').strip().lower()
+    with_insights = request.args.get('insights', '').strip().lower() in ('1', 'true', 'yes')
+    if orient not in ('records', 'columns'):
+        return jsonify({"message": "format must be 'records' or 'columns'."}), 400
 
-    if search_query:
-        final_df = final_df[final_df['student_id'].str.contains(search_query, case=False, na=False)]
-    if risk_filter and risk_filter != 'all':
-        final_df = final_df[final_df['risk_level'].str.lower() == risk_filter]
-
-    final_df = final_df.replace({np.nan: None})
-    return jsonify(final_df.to_dict(orient="records"))
-
-@app.route("/api/student/<student_id>", methods=["GET"])
-def get_student(student_id):
-    merged_df, test_scores_df, error = get_data_from_db()
-    if error:
-        return jsonify({"message": error}), 500
-
-    student_info_df = merged_df[merged_df['student_id'] == student_id]
-    if student_info_df.empty:
+    try:
+        field, descending = parse_sort(sort) if sort else ('student_id', False)
+        limit = parse_limit(limit) if limit else (DEFAULT_PAGE_SIZE if cursor else None)
+        cursor = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    unknown = [f for f in fields if f not in final_df.columns]
+    if unknown:
+        return jsonify({"message": f"Unknown fields: {unknown}"}), 400
+
+    # Filters narrow a boolean mask over row positions; the precomputed
+    # sort order is then walked in place instead of re-sorting the frame.
+    with span('filter') as stage:
+        selected = None
+        if risk_filter and risk_filter != 'all':
+            selected = np.zeros(len(final_df), dtype=bool)
+            selected[by_level.get(risk_filter, [])] = True
+        if search_query:
+            with span('db_read') as search_stage, connection() as conn:
+                matched_ids = search_student_ids(conn, search_query)
+                search_stage.rows = len(matched_ids)
+            ranked = np.fromiter((index[sid] for sid in matched_ids if sid in index), dtype=np.intp)
+            if not sort:
+                # Page through the matches in rank order: the key of a row is
+                # its rank, so the same keyset cursor works.
+                keys = np.full(len(final_df), np.inf)
+                keys[ranked] = np.arange(len(ranked))
+                orders = {**orders, 'rank': (ranked, keys, keys[ranked])}
+                field = sort = 'rank'
+            matches = np.zeros(len(final_df), dtype=bool)
+            matches[ranked] = True
+            selected = matches if selected is None else selected & matches
+
+        headers = {}
+        if sort or limit:
+            order, keys, sorted_keys = orders[field]
+            if selected is not None:
+                kept = selected[order]
+                order, sorted_keys = order[kept], sorted_keys[kept]
+            headers['X-Total-Count'] = str(len(order))
+            if limit:
+                try:
+                    order, next_cursor = keyset_page(order, keys, sorted_keys, orders['student_id'][1],
+                                                     limit, cursor, descending)
+                except ValueError as e:
+                    return jsonify({"message": str(e)}), 400
+                if next_cursor:
+                    headers['X-Next-Cursor'] = next_cursor
+            elif descending:
+                order = order[::-1]
+            final_df = final_df.iloc[order]
+        elif selected is not None:
+            final_df = final_df[selected]
+        stage.rows = len(final_df)
+
+    with span('serialize') as stage:
+        if with_insights:
+            reasons, advice = render_rows(final_df['reason_codes'], final_df['attendance_percentage'],
+                                          final_df['avg_test_score'])
+        if fields:
+            final_df = final_df[fields]
+        if with_insights:
+            final_df = final_df.assign(reasons=reasons, advice=advice)
+        stage.rows = len(final_df)
+        return json_response(frame_to_json(final_df, orient), 200, headers)
+
+def get_student_detail(student_id):
+    """Build the detail payload (info + scores) for one student."""
+    try:
+        student_info, student_scores = fetch_student(student_id)
+        model_error = student_info is not None and refresh_score(student_info)
+    except sqlite3.Error as e:
+        return jsonify({"message": f"Database connection error: {e}"}), 500
+    if student_info is None:
         return jsonify({"message": "Student not found."}), 404
-
-    final_df, model_error = predict_risk(merged_df)
     if model_error:
         return jsonify({"message": model_error}), 500
 
-    student_info_final = final_df[final_df['student_id'] == student_id]
-    student_info = student_info_final.to_dict(orient="records")[0]
-    student_info['fee_status'] = merged_df[merged_df['student_id'] == student_id]['fee_status'].iloc[0]
-
-    reasons, advice = get_counseling_insights(student_info, MODEL, FEATURES)
+    reasons, advice = render_insights(student_info['reason_codes'] or 0,
+                                      student_info['attendance_percentage'], student_info['avg_test_score'])
     student_info['reasons'] = reasons
     student_info['advice'] = advice
+    with span('serialize') as stage:
+        stage.rows = 1 + len(student_scores)
+        return jsonify({"info": student_info, "scores": student_scores})
 
-    student_scores = test_scores_df[test_scores_df['student_id'] == student_id].to_dict(orient="records")
-    return jsonify({"info": student_info, "scores": student_scores})
+@app.route("/api/student/<student_id>", methods=["GET"])
+@conditional(DATA_VERSION)
+def get_student(student_id):
+    return get_student_detail(student_id)
 
 @app.route("/api/subjects/scores", methods=["GET"])
+@conditional(DATA_VERSION)
 def get_subject_scores():
+    # Served from the trigger-maintained subject_stats summary (migration 3),
+    # so the cost depends on the number of subjects, not score rows.
+    include_buckets = request.args.get('buckets', '').lower() in ('1', 'true', 'yes')
     try:
-        conn = sqlite3.connect('students.db')
-        test_scores_df = pd.read_sql_query("SELECT subject, test_score FROM test_scores", conn)
-        conn.close()
-        avg_scores_by_subject = test_scores_df.groupby('subject')['test_score'].mean().reset_index()
-        return jsonify(avg_scores_by_subject.to_dict(orient="records"))
+        with span('db_read') as stage, connection() as conn:
+            stats = conn.execute(
+                "SELECT subject, score_count, score_sum, score_sumsq, score_min, score_max "
+                "FROM subject_stats ORDER BY subject"
+            ).fetchall()
+            stage.rows = len(stats)
+            buckets = {}
+            if include_buckets:
+                for subject, bucket, count in conn.execute(
+                    "SELECT subject, bucket, score_count FROM subject_score_buckets"
+                ):
+                    buckets.setdefault(subject, [0] * 10)[bucket] = count
+
+        result = []
+        for subject, count, total, total_sq, score_min, score_max in stats:
+            mean = total / count
+            entry = {
+                'subject': subject,
+                'test_score': mean,
+                'count': count,
+                'min': score_min,
+                'max': score_max,
+                'stddev': math.sqrt(max(total_sq / count - mean * mean, 0.0)),
+            }
+            if include_buckets:
+                entry['distribution'] = buckets.get(subject, [0] * 10)
+            result.append(entry)
+        return jsonify(result)
     except Exception as e:
         return jsonify({"message": f"Error fetching subject scores: {e}"}), 500
 
@@ -293,93 +571,76 @@ def upload_data():
     if file.filename == '':
         return jsonify({"message": "No file selected"}), 400
 
+    # Parsing and inserting happen on the upload pool; poll /api/jobs/<job_id>.
     try:
-        df = pd.read_csv(io.StringIO(file.stream.read().decode("UTF8")))
-        conn = sqlite3.connect('students.db')
-
-        existing_ids_df = pd.read_sql_query("SELECT student_id FROM students", conn)
-        existing_ids = existing_ids_df['student_id'].astype(str).tolist()
-        df['student_id'] = df['student_id'].astype(str)
-
-        required_cols = ['student_id', 'attendance_percentage', 'fee_status', 'subject', 'test_score', 'test_number']
-        if not all(col in df.columns for col in required_cols):
-            conn.close()
-            return jsonify({"message": "Missing required columns"}), 400
-
-        new_students_df = df[~df['student_id'].isin(existing_ids)]
-        if new_students_df.empty:
-            conn.close()
-            return jsonify({"message": "No new student data to upload."}), 200
-
-        students_to_add = new_students_df[['student_id', 'attendance_percentage', 'fee_status']]
-        test_scores_to_add = new_students_df[['student_id', 'subject', 'test_score', 'test_number']]
+        job_id = UPLOADS.submit(spool_upload(file.stream), file.filename)
+    except Exception as e:
+        return jsonify({"message": f"Error accepting file: {e}"}), 500
 
-        students_to_add.to_sql('students', conn, if_exists='append', index=False)
-        test_scores_to_add.to_sql('test_scores', conn, if_exists='append', index=False)
+    status_url = f"/api/jobs/{job_id}"
+    return jsonify({"message": "Upload accepted.", "job_id": job_id, "status_url": status_url}), 202, \
+        {'Location': status_url}
 
-        conn.close()
-        return jsonify({"message": f"Uploaded {len(new_students_df)} new student(s)."}), 200
-    except Exception as e:
-        return jsonify({"message": f"Error processing file: {e}"}), 500
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Upload job state (queued, running, done, failed) with rows read, added, skipped and any error."""
+    try:
+        job = UPLOADS.get(job_id)
+    except sqlite3.Error as e:
+        return jsonify({"message": f"Error fetching job: {e}"}), 500
+    if job is None:
+        return jsonify({"message": "Job not found."}), 404
+    return jsonify(job)
 
 @app.route("/api/student/trends/<student_id>", methods=["GET"])
+@conditional(DATA_VERSION)
 def get_student_trends(student_id):
+    """Test scores in test order; `?by=subject` returns one series per subject."""
     try:
-        conn = sqlite3.connect('students.db')
-        test_scores_df = pd.read_sql_query(
-            f"SELECT test_number, test_score FROM test_scores WHERE student_id='{student_id}' ORDER BY test_number", conn
-        )
-        conn.close()
-
-        if test_scores_df.empty:
-            return jsonify({"message": "No trend data available."}), 404
-
-        return jsonify(test_scores_df.to_dict(orient="records"))
-    except Exception as e:
+        with span('db_read') as stage:
+            rows = TRENDS.series(student_id)
+            stage.rows = len(rows)
+    except sqlite3.Error as e:
         return jsonify({"message": f"Error fetching trends: {e}"}), 500
 
+    if not rows:
+        return jsonify({"message": "No trend data available."}), 404
+    if request.args.get('by') == 'subject':
+        return json_response(dumps(by_subject(rows)))
+    return json_response(dumps(as_points(rows)))
+
 @app.route("/api/users", methods=["GET"])
 def get_users():
     try:
-        conn = sqlite3.connect('students.db')
-        users_df = pd.read_sql_query("SELECT username, role FROM users", conn)
-        conn.close()
-        return jsonify(users_df.to_dict(orient="records"))
+        with connection() as conn:
+            users_df = pd.read_sql_query("SELECT username, role FROM users", conn)
+        return json_response(frame_to_json(users_df))
     except Exception as e:
         return jsonify({"message": f"Error fetching users: {e}"}), 500
     
 
 @app.route("/api/student/delete/<student_id>", methods=["DELETE"])
 def delete_student(student_id):
-    conn = None
     try:
-        conn = sqlite3.connect('students.db')
-        cursor = conn.cursor()
-        
-        # Start a transaction
-        conn.execute("BEGIN TRANSACTION")
-        
-        # Delete from the test_scores table first
-        cursor.execute("DELETE FROM test_scores WHERE student_id = ?", (student_id,))
-        
-        # Then delete from the students table
-        cursor.execute("DELETE FROM students WHERE student_id = ?", (student_id,))
-        
-        # Check if any student was deleted
-        if cursor.rowcount == 0:
-            conn.execute("ROLLBACK")
-            return jsonify({'message': f'Student {student_id} not found.'}), 404
-        
-        conn.execute("COMMIT")
+        with transaction() as conn:
+            # Delete from the test_scores table first
+            conn.execute("DELETE FROM test_scores WHERE student_id = ?", (student_id,))
+
+            # Then delete from the students table
+            cursor = conn.execute("DELETE FROM students WHERE student_id = ?", (student_id,))
+
+            # Check if any student was deleted
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return jsonify({'message': f'Student {student_id} not found.'}), 404
+
+        drop_from_risk_store(student_id)
+        record_write()
         return jsonify({'message': f'Student {student_id} and their records deleted successfully.'}), 200
-        
+
     except Exception as e:
-        conn.execute("ROLLBACK") # Rollback on error
         return jsonify({'message': f'Error deleting student: {e}'}), 500
-    finally:
-        if conn:
-            conn.close()
-            
+
 
 @app.route("/api/student/update", methods=["POST"])
 def update_student():
@@ -390,31 +651,28 @@ def update_student():
     if not student_id or not updates:
         return jsonify({"message": "Student ID and updates are required."}), 400
 
-    conn = None
     try:
-        conn = sqlite3.connect('students.db')
-        cursor = conn.cursor()
-        
         set_clause = ", ".join([f"{key} = ?" for key in updates.keys()])
         values = list(updates.values())
         values.append(student_id)
-        
+
         sql = f"UPDATE students SET {set_clause} WHERE student_id = ?"
-        cursor.execute(sql, values)
-        conn.commit()
-        
+        with transaction() as conn:
+            cursor = conn.execute(sql, values)
+
         if cursor.rowcount == 0:
             return jsonify({'message': f'Student {student_id} not found.'}), 404
-        
+
+        patch_risk_store(student_id)
+        if 'student_id' in updates:
+            patch_risk_store(str(updates['student_id']))
+        record_write()
         return jsonify({'message': f'Student {student_id} updated successfully.'}), 200
         
     except Exception as e:
         return jsonify({'message': f'Error updating student: {e}'}), 500
-    finally:
-        if conn:
-            conn.close()
-            
-            
+
+
 # Student-only login endpoint
 @app.route("/api/student-login", methods=['POST'])
 def student_login():
@@ -425,34 +683,29 @@ def student_login():
     if not username or not password:
         return jsonify({'message': 'Username and password required'}), 400
 
-    conn = sqlite3.connect('students.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT password, role FROM users WHERE username=?", (username,))
-    user_data = cursor.fetchone()
-    conn.close()
+    with connection() as conn:
+        user_data = conn.execute("SELECT password, role FROM users WHERE username=?", (username,)).fetchone()
 
-    if user_data and user_data[1] == 'student' and check_password_hash(user_data[0], password):
-        return jsonify({'message': 'Login successful', 'role': 'student', 'username': username}), 200
+    try:
+        valid = user_data is not None and user_data[1] == 'student' and PASSWORDS.verify(user_data[0], password)
+    except Overloaded as e:
+        return overloaded_response(e)
+    if valid:
+        return jsonify({'message': 'Login successful', **_session_payload(username, 'student')}), 200
     return jsonify({'message': 'Invalid credentials or not a student account.'}), 401
 
 
 # Delete a user by username
 @app.route("/api/user/delete/<username>", methods=["DELETE"])
 def delete_user(username):
-    conn = None
     try:
-        conn = sqlite3.connect('students.db')
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM users WHERE username = ?", (username,))
-        conn.commit()
+        with transaction() as conn:
+            cursor = conn.execute("DELETE FROM users WHERE username = ?", (username,))
         if cursor.rowcount == 0:
             return jsonify({'message': f'User {username} not found.'}), 404
         return jsonify({'message': f'User {username} deleted successfully.'}), 200
     except Exception as e:
         return jsonify({'message': f'Error deleting user: {e}'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 # Update a user's role (only allow 'admin' or 'student')
 @app.route("/api/user/update", methods=["POST"])
@@ -464,50 +717,126 @@ def update_user():
         return jsonify({'message': 'Username and role are required.'}), 400
     if role not in ['admin', 'student']:
         return jsonify({'message': 'Invalid role. Only admin or student allowed.'}), 400
-    conn = None
     try:
-        conn = sqlite3.connect('students.db')
-        cursor = conn.cursor()
-        cursor.execute("UPDATE users SET role = ? WHERE username = ?", (role, username))
-        conn.commit()
+        with transaction() as conn:
+            cursor = conn.execute("UPDATE users SET role = ? WHERE username = ?", (role, username))
         if cursor.rowcount == 0:
             return jsonify({'message': f'User {username} not found.'}), 404
         return jsonify({'message': f'User {username} role updated to {role}.'}), 200
     except Exception as e:
         return jsonify({'message': f'Error updating user: {e}'}), 500
-    finally:
-        if conn:
-            conn.close()
+
+
+@app.route("/api/model", methods=["GET"])
+def get_model_status():
+    artifacts = ACTIVE_MODEL
+    return jsonify({'version': artifacts.version if artifacts else None, **TRAINER.status()})
+
+@app.route("/api/model/retrain", methods=["POST"])
+def retrain_model():
+    TRAINER.submit('manual')
+    return jsonify({'message': 'Retraining started in the background.', **TRAINER.status()}), 202
+
+@app.route("/api/counseling/thresholds", methods=["GET"])
+def get_counseling_thresholds():
+    with connection() as conn:
+        return jsonify(load_thresholds(conn))
+
+@app.route("/api/counseling/thresholds", methods=["POST"])
+def update_counseling_thresholds():
+    data = request.json or {}
+    unknown = [name for name in data if name not in DEFAULT_THRESHOLDS]
+    if not data or unknown:
+        return jsonify({"message": f"Expected any of {list(DEFAULT_THRESHOLDS)}; unknown: {unknown}"}), 400
+    try:
+        values = [(name, float(value)) for name, value in data.items()]
+    except (TypeError, ValueError):
+        return jsonify({"message": "Threshold values must be numbers."}), 400
+
+    # The counseling_thresholds triggers queue every student for rescoring.
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO counseling_thresholds (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+            values
+        )
+        thresholds = load_thresholds(conn)
+    invalidate_risk_store()
+    record_write()
+    RESCORER.wake()
+    return jsonify({'message': 'Thresholds updated.', **thresholds}), 200
 
 
 # Get current student info (for dashboard)
 @app.route("/api/student/me", methods=["GET"])
+@require_session('student')
+@conditional(DATA_VERSION, scope=lambda: current_session()['username'], vary=('Authorization',))
 def get_student_me():
-    # For demo: get username from query param (frontend should send ?username=...)
-    username = request.args.get('username')
-    if not username:
-        return jsonify({"message": "Username required as query param."}), 400
-    merged_df, test_scores_df, error = get_data_from_db()
-    if error:
-        return jsonify({"message": error}), 500
-    student_info_df = merged_df[merged_df['student_id'] == username]
-    if student_info_df.empty:
-        return jsonify({"message": "Student not found."}), 404
-    final_df, model_error = predict_risk(merged_df)
-    if model_error:
-        return jsonify({"message": model_error}), 500
-    student_info_final = final_df[final_df['student_id'] == username]
-    student_info = student_info_final.to_dict(orient="records")[0]
-    student_info['fee_status'] = merged_df[merged_df['student_id'] == username]['fee_status'].iloc[0]
-    reasons, advice = get_counseling_insights(student_info, MODEL, FEATURES)
-    student_info['reasons'] = reasons
-    student_info['advice'] = advice
-    # Get test scores for this student
-    student_scores = test_scores_df[test_scores_df['student_id'] == username].to_dict(orient="records")
-    return jsonify({"info": student_info, "scores": student_scores})
+    """The logged-in student's own record, identified by their session token."""
+    return get_student_detail(current_session()['username'])
 
 
+@app.route("/api/snapshot", methods=["GET"])
+def download_snapshot():
+    """The current cohort snapshot; `format=parquet` (default) or `format=arrow`.
+
+    Written first if the data changed since the last one.
+    """
+    fmt = request.args.get('format', 'parquet').strip().lower()
+    if fmt not in SNAPSHOT_FILES:
+        return jsonify({"message": f"format must be one of {sorted(SNAPSHOT_FILES)}."}), 400
+    if not SNAPSHOTS.enabled:
+        return jsonify({"message": "Snapshots need pyarrow, which is not installed."}), 503
+    try:
+        # The open file and the version read from it: a concurrent rewrite
+        # can neither swap the file mid-download nor mislabel its ETag.
+        f, version = SNAPSHOTS.open(fmt)
+    except Exception as e:
+        return jsonify({"message": f"Error writing snapshot: {e}"}), 500
+    if f is None:
+        return jsonify({"message": "No data found."}), 404
+    return send_file(f, mimetype=MIMETYPES[fmt], as_attachment=True,
+                     download_name=f"cohort-{version}.{fmt}", etag=version, conditional=True)
+
+# -------------------- Metrics --------------------
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Request and per-stage latency histograms and row counters, in Prometheus text format.
+
+    Send `X-Profile: 1` with any request to get its own stage breakdown
+    back in a Server-Timing header.
+    """
+    return Response(METRICS.render(), content_type=CONTENT_TYPE)
+
+# After every route, so each endpoint gets its series.
+METRICS.init_app(app)
+
 # -------------------- Run --------------------
+def prepare_app(preload=None):
+    """Migrate the schema and optionally load the model and score the cohort up front.
+
+    preload defaults to on unless FAST_STARTUP=1, in which case the model
+    bundle is loaded and the cohort scored on the first request that needs
+    them. Used by the dev server below and by wsgi.create_app().
+    """
+    with connection() as conn:
+        migrate(conn)
+    with transaction() as conn:
+        fail_interrupted_jobs(conn)
+    if preload is None:
+        preload = os.environ.get('FAST_STARTUP') != '1'
+    if preload:
+        train_model_once()
+        # Persist queued scores now, before any worker starts, so the build
+        # below has nothing left to score or hand to the background thread.
+        RESCORER.drain()
+        build_risk_store()
+    # No background threads start here: under gunicorn --preload this runs
+    # in the master before it forks. Workers start the snapshot writer on
+    # their first write, and /api/snapshot writes a missing one on demand.
+    return app
+
 if __name__ == "__main__":
-    train_model_once()
+    # Development server only; see wsgi.py for production serving.
+    prepare_app()
     app.run(debug=True)
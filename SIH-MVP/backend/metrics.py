@@ -0,0 +1,168 @@
+import bisect
+import multiprocessing
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+STAGES = ('db_read', 'merge', 'features', 'inference', 'filter', 'serialize')
+# Upper bounds in seconds; a final +Inf bucket is implied.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Requests sending this header (any non-empty value) get their stage
+# breakdown back in a Server-Timing header.
+PROFILE_HEADER = 'X-Profile'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Endpoint label for spans recorded outside a request (startup, background
+# rescoring and training) and for requests that matched no route.
+BACKGROUND = 'background'
+UNMATCHED = 'unmatched'
+# Pseudo-stage holding whole-request latency.
+_REQUEST = 'request'
+
+
+class Span:
+    """A timed stage; set `rows` inside the block to count rows it handled."""
+
+    __slots__ = ('rows',)
+
+    def __init__(self):
+        self.rows = 0
+
+
+class RequestMetrics:
+    """Latency histograms and row counters per endpoint and stage.
+
+    `with span('db_read') as s:` times a stage of the current request;
+    init_app() adds whole-request timing and the profiling header. The
+    counters live in shared memory allocated by init_app(), so when that
+    runs before the server forks (gunicorn --preload) /metrics on any
+    worker reports the totals for all of them.
+    """
+
+    def __init__(self, stages=STAGES, buckets=LATENCY_BUCKETS):
+        self.stages = (_REQUEST, *stages)
+        self.buckets = tuple(buckets)
+        # Per series: one count per bucket plus +Inf, then sum, then rows.
+        self._width = len(self.buckets) + 3
+        self._lock = multiprocessing.Lock()
+        self._slots = {}
+        self._values = None
+
+    def init_app(self, app):
+        """Allocate a series for every endpoint x stage and hook request timing.
+
+        Call after all routes are registered.
+        """
+        endpoints = sorted(app.view_functions) + [BACKGROUND, UNMATCHED]
+        self._slots = {}
+        for endpoint in endpoints:
+            for stage in self.stages:
+                self._slots[(endpoint, stage)] = len(self._slots) * self._width
+        self._values = multiprocessing.RawArray('d', len(self._slots) * self._width)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    @contextmanager
+    def span(self, stage: str):
+        current = Span()
+        start = time.perf_counter()
+        try:
+            yield current
+        finally:
+            elapsed = time.perf_counter() - start
+            if has_request_context() and 'metrics_spans' in g:
+                g.metrics_spans.append((stage, elapsed, current.rows))
+            else:
+                self._observe([(BACKGROUND, stage, elapsed, current.rows)])
+
+    def _observe(self, observations):
+        if self._values is None:
+            return
+        values = self._values
+        with self._lock:
+            for endpoint, stage, elapsed, rows in observations:
+                base = self._slots.get((endpoint, stage))
+                if base is None:
+                    continue
+                values[base + bisect.bisect_left(self.buckets, elapsed)] += 1
+                values[base + len(self.buckets) + 1] += elapsed
+                values[base + len(self.buckets) + 2] += rows
+
+    def _start_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_spans = []
+
+    def _finish_request(self, response):
+        if 'metrics_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_start
+        endpoint = request.endpoint or UNMATCHED
+        spans = g.metrics_spans
+        self._observe([(endpoint, _REQUEST, elapsed, 0)]
+                      + [(endpoint, stage, seconds, rows) for stage, seconds, rows in spans])
+
+        if request.headers.get(PROFILE_HEADER):
+            response.headers['Server-Timing'] = server_timing(spans, elapsed)
+        return response
+
+    def render(self) -> str:
+        """All non-empty series in Prometheus text exposition format."""
+        if self._values is None:
+            return ''
+        with self._lock:
+            values = self._values[:]
+
+        n = len(self.buckets)
+        request_lines, stage_lines, row_lines = [], [], []
+        for (endpoint, stage), base in self._slots.items():
+            counts = values[base:base + n + 1]
+            total = sum(counts)
+            if not total:
+                continue
+            if stage == _REQUEST:
+                name, labels, lines = 'sih_request_duration_seconds', f'endpoint="{endpoint}"', request_lines
+            else:
+                name, labels, lines = 'sih_stage_duration_seconds', f'endpoint="{endpoint}",stage="{stage}"', stage_lines
+                row_lines.append(f'sih_stage_rows_total{{{labels}}} {values[base + n + 2]:.0f}')
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative:.0f}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {total:.0f}')
+            lines.append(f'{name}_sum{{{labels}}} {values[base + n + 1]!r}')
+            lines.append(f'{name}_count{{{labels}}} {total:.0f}')
+
+        out = [
+            '# HELP sih_request_duration_seconds Request latency by endpoint.',
+            '# TYPE sih_request_duration_seconds histogram',
+            *request_lines,
+            '# HELP sih_stage_duration_seconds Time spent in each stage of a request.',
+            '# TYPE sih_stage_duration_seconds histogram',
+            *stage_lines,
+            '# HELP sih_stage_rows_total Rows handled by each stage.',
+            '# TYPE sih_stage_rows_total counter',
+            *row_lines,
+        ]
+        return '\n'.join(out) + '\n'
+
+
+def server_timing(spans, total: float) -> str:
+    """Server-Timing header value: per-stage milliseconds (repeated stages summed), then the total."""
+    stages = {}
+    for stage, seconds, rows in spans:
+        seconds_sum, rows_sum = stages.get(stage, (0.0, 0))
+        stages[stage] = (seconds_sum + seconds, rows_sum + rows)
+    parts = []
+    for stage, (seconds, rows) in stages.items():
+        part = f'{stage};dur={seconds * 1000:.3f}'
+        if rows:
+            part += f';desc="{rows} rows"'
+        parts.append(part)
+    parts.append(f'total;dur={total * 1000:.3f}')
+    return ', '.join(parts)
+
+
+# The app's instance; features.py and main.py time their stages through it.
+METRICS = RequestMetrics()
+span = METRICS.span
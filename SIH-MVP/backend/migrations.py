@@ -0,0 +1,479 @@
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+from db import DB_PATH, connect
+
+# Scores fall into ten buckets of width 10; 100 joins the top bucket.
+SCORE_BUCKET_SQL = "MIN(MAX(CAST({row}.test_score / 10 AS INTEGER), 0), 9)"
+
+
+def _subject_stats_add(row):
+    """Trigger body that folds {row} (NEW) into subject_stats and its bucket."""
+    bucket = SCORE_BUCKET_SQL.format(row=row)
+    return f"""
+        INSERT INTO subject_stats (subject, score_count, score_sum, score_sumsq, score_min, score_max)
+        VALUES ({row}.subject, 1, {row}.test_score, {row}.test_score * {row}.test_score,
+                {row}.test_score, {row}.test_score)
+        ON CONFLICT (subject) DO UPDATE SET
+            score_count = score_count + 1,
+            score_sum = score_sum + excluded.score_sum,
+            score_sumsq = score_sumsq + excluded.score_sumsq,
+            score_min = MIN(score_min, excluded.score_min),
+            score_max = MAX(score_max, excluded.score_max);
+        INSERT INTO subject_score_buckets (subject, bucket, score_count)
+        VALUES ({row}.subject, {bucket}, 1)
+        ON CONFLICT (subject, bucket) DO UPDATE SET score_count = score_count + 1;
+    """
+
+
+def _subject_stats_remove(row):
+    """Trigger body that takes {row} (OLD) back out of subject_stats.
+
+    min/max are only re-read (via ix_test_scores_subject_score) when the
+    removed score was the current extreme.
+    """
+    bucket = SCORE_BUCKET_SQL.format(row=row)
+    return f"""
+        UPDATE subject_stats SET
+            score_count = score_count - 1,
+            score_sum = score_sum - {row}.test_score,
+            score_sumsq = score_sumsq - {row}.test_score * {row}.test_score,
+            score_min = CASE WHEN {row}.test_score > score_min THEN score_min
+                ELSE (SELECT MIN(test_score) FROM test_scores WHERE subject = {row}.subject) END,
+            score_max = CASE WHEN {row}.test_score < score_max THEN score_max
+                ELSE (SELECT MAX(test_score) FROM test_scores WHERE subject = {row}.subject) END
+        WHERE subject = {row}.subject;
+        DELETE FROM subject_stats WHERE subject = {row}.subject AND score_count <= 0;
+        UPDATE subject_score_buckets SET score_count = score_count - 1
+        WHERE subject = {row}.subject AND bucket = {bucket};
+        DELETE FROM subject_score_buckets
+        WHERE subject = {row}.subject AND bucket = {bucket} AND score_count <= 0;
+    """
+
+
+SUBJECT_STATS_BACKFILL = [
+    "DELETE FROM subject_stats",
+    "DELETE FROM subject_score_buckets",
+    """
+    INSERT INTO subject_stats (subject, score_count, score_sum, score_sumsq, score_min, score_max)
+    SELECT subject, COUNT(*), SUM(test_score), SUM(test_score * test_score),
+           MIN(test_score), MAX(test_score)
+    FROM test_scores
+    WHERE subject IS NOT NULL AND test_score IS NOT NULL
+    GROUP BY subject
+    """,
+    f"""
+    INSERT INTO subject_score_buckets (subject, bucket, score_count)
+    SELECT subject, {SCORE_BUCKET_SQL.format(row='test_scores')} AS bucket, COUNT(*)
+    FROM test_scores
+    WHERE subject IS NOT NULL AND test_score IS NOT NULL
+    GROUP BY subject, bucket
+    """,
+]
+
+# An update is a remove of OLD plus an add of NEW; split in two so either
+# side can be skipped when its subject/score is NULL.
+SUBJECT_STATS_TRIGGERS = [
+    ("trg_test_scores_stats_insert", f"""
+    CREATE TRIGGER IF NOT EXISTS trg_test_scores_stats_insert
+    AFTER INSERT ON test_scores
+    WHEN NEW.subject IS NOT NULL AND NEW.test_score IS NOT NULL
+    BEGIN {_subject_stats_add('NEW')} END
+    """),
+    ("trg_test_scores_stats_delete", f"""
+    CREATE TRIGGER IF NOT EXISTS trg_test_scores_stats_delete
+    AFTER DELETE ON test_scores
+    WHEN OLD.subject IS NOT NULL AND OLD.test_score IS NOT NULL
+    BEGIN {_subject_stats_remove('OLD')} END
+    """),
+    ("trg_test_scores_stats_update_old", f"""
+    CREATE TRIGGER IF NOT EXISTS trg_test_scores_stats_update_old
+    AFTER UPDATE OF subject, test_score ON test_scores
+    WHEN OLD.subject IS NOT NULL AND OLD.test_score IS NOT NULL
+    BEGIN {_subject_stats_remove('OLD')} END
+    """),
+    ("trg_test_scores_stats_update_new", f"""
+    CREATE TRIGGER IF NOT EXISTS trg_test_scores_stats_update_new
+    AFTER UPDATE OF subject, test_score ON test_scores
+    WHEN NEW.subject IS NOT NULL AND NEW.test_score IS NOT NULL
+    BEGIN {_subject_stats_add('NEW')} END
+    """),
+]
+
+
+@contextmanager
+def subject_stats_suspended(conn: sqlite3.Connection):
+    """Drop the per-row subject_stats triggers around a bulk load.
+
+    On exit the summary is rebuilt with one aggregate pass and the triggers
+    are recreated. Run it inside the load's transaction so readers never see
+    the summary out of step with test_scores.
+    """
+    for name, _ in SUBJECT_STATS_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    yield
+    for statement in SUBJECT_STATS_BACKFILL:
+        conn.execute(statement)
+    for _, statement in SUBJECT_STATS_TRIGGERS:
+        conn.execute(statement)
+
+
+# Trigram index over the searchable student columns. It stores its own copy
+# of the text (keyed by student_id) rather than pointing at students' implicit
+# rowid, which VACUUM is free to renumber.
+STUDENT_SEARCH_TRIGGERS = [
+    ("trg_students_search_insert", """
+    CREATE TRIGGER IF NOT EXISTS trg_students_search_insert
+    AFTER INSERT ON students
+    BEGIN
+        INSERT INTO student_search (student_id, name, prn) VALUES (NEW.student_id, NEW.name, NEW.prn);
+    END
+    """),
+    ("trg_students_search_delete", """
+    CREATE TRIGGER IF NOT EXISTS trg_students_search_delete
+    AFTER DELETE ON students
+    BEGIN
+        DELETE FROM student_search WHERE student_id = OLD.student_id;
+    END
+    """),
+    ("trg_students_search_update", """
+    CREATE TRIGGER IF NOT EXISTS trg_students_search_update
+    AFTER UPDATE OF student_id, name, prn ON students
+    WHEN OLD.student_id IS NOT NEW.student_id OR OLD.name IS NOT NEW.name OR OLD.prn IS NOT NEW.prn
+    BEGIN
+        DELETE FROM student_search WHERE student_id = OLD.student_id;
+        INSERT INTO student_search (student_id, name, prn) VALUES (NEW.student_id, NEW.name, NEW.prn);
+    END
+    """),
+]
+
+
+# Writes that change a student's model inputs queue the student for
+# rescoring; risk_scores.RescoreWorker drains the queue.
+RISK_DIRTY_TRIGGERS = [
+    ("trg_students_risk_insert", """
+    CREATE TRIGGER IF NOT EXISTS trg_students_risk_insert
+    AFTER INSERT ON students
+    BEGIN
+        INSERT OR IGNORE INTO risk_dirty (student_id) VALUES (NEW.student_id);
+    END
+    """),
+    ("trg_students_risk_update", """
+    CREATE TRIGGER IF NOT EXISTS trg_students_risk_update
+    AFTER UPDATE OF student_id, attendance_percentage, fee_status ON students
+    BEGIN
+        INSERT OR IGNORE INTO risk_dirty (student_id) VALUES (OLD.student_id);
+        INSERT OR IGNORE INTO risk_dirty (student_id) VALUES (NEW.student_id);
+    END
+    """),
+    ("trg_students_risk_delete", """
+    CREATE TRIGGER IF NOT EXISTS trg_students_risk_delete
+    AFTER DELETE ON students
+    BEGIN
+        DELETE FROM risk_dirty WHERE student_id = OLD.student_id;
+        DELETE FROM risk_scores WHERE student_id = OLD.student_id;
+    END
+    """),
+    ("trg_test_scores_risk_insert", """
+    CREATE TRIGGER IF NOT EXISTS trg_test_scores_risk_insert
+    AFTER INSERT ON test_scores
+    BEGIN
+        INSERT OR IGNORE INTO risk_dirty (student_id) VALUES (NEW.student_id);
+    END
+    """),
+    ("trg_test_scores_risk_update", """
+    CREATE TRIGGER IF NOT EXISTS trg_test_scores_risk_update
+    AFTER UPDATE OF student_id, test_score ON test_scores
+    BEGIN
+        INSERT OR IGNORE INTO risk_dirty (student_id) VALUES (OLD.student_id);
+        INSERT OR IGNORE INTO risk_dirty (student_id) VALUES (NEW.student_id);
+    END
+    """),
+    ("trg_test_scores_risk_delete", """
+    CREATE TRIGGER IF NOT EXISTS trg_test_scores_risk_delete
+    AFTER DELETE ON test_scores
+    BEGIN
+        INSERT OR IGNORE INTO risk_dirty (student_id) VALUES (OLD.student_id);
+    END
+    """),
+]
+
+
+# Reason codes are stored with each score, so changing a threshold queues
+# the whole cohort for rescoring.
+COUNSELING_THRESHOLD_TRIGGERS = [
+    (f"trg_counseling_thresholds_{event.lower()}", f"""
+    CREATE TRIGGER IF NOT EXISTS trg_counseling_thresholds_{event.lower()}
+    AFTER {event} ON counseling_thresholds
+    BEGIN
+        INSERT OR IGNORE INTO risk_dirty (student_id) SELECT student_id FROM students;
+    END
+    """)
+    for event in ("INSERT", "UPDATE", "DELETE")
+]
+
+
+# Each migration is (version, description, statements). The applied version is
+# tracked in PRAGMA user_version, so an existing students.db is upgraded in
+# place: only migrations newer than the stored version run, each in its own
+# transaction.
+MIGRATIONS = [
+    (1, "base schema", [
+        """
+        CREATE TABLE IF NOT EXISTS students (
+            student_id TEXT PRIMARY KEY,
+            name TEXT,
+            prn TEXT UNIQUE,
+            fee_status TEXT,
+            attendance_percentage INTEGER,
+            avgMarks REAL,
+            sem1_att INTEGER,
+            sem2_att INTEGER,
+            sem3_att INTEGER,
+            sem4_att INTEGER,
+            sem5_att INTEGER,
+            sem6_att INTEGER,
+            sem1_cgpa REAL,
+            sem2_cgpa REAL,
+            sem3_cgpa REAL,
+            sem4_cgpa REAL,
+            sem5_cgpa REAL,
+            sem6_cgpa REAL,
+            credits INTEGER,
+            wellbeing INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS test_scores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT,
+            subject TEXT,
+            test_number INTEGER,
+            test_score INTEGER,
+            FOREIGN KEY (student_id) REFERENCES students (student_id)
+        )
+        """,
+    ]),
+    (2, "test_scores indexes and unique (student_id, subject, test_number)", [
+        # The unique index cannot be built over existing duplicates; keep the
+        # first row per key, as clean_db.py does.
+        """
+        DELETE FROM test_scores
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM test_scores GROUP BY student_id, subject, test_number
+        )
+        """,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_test_scores_student_subject_test
+        ON test_scores (student_id, subject, test_number)
+        """,
+        # Covers the trends query: WHERE student_id = ? ORDER BY test_number.
+        """
+        CREATE INDEX IF NOT EXISTS ix_test_scores_student_test
+        ON test_scores (student_id, test_number, test_score)
+        """,
+        # Covers per-subject aggregation without touching the table.
+        """
+        CREATE INDEX IF NOT EXISTS ix_test_scores_subject_score
+        ON test_scores (subject, test_score)
+        """,
+    ]),
+    (3, "subject_stats summary tables kept current by triggers", [
+        """
+        CREATE TABLE IF NOT EXISTS subject_stats (
+            subject TEXT PRIMARY KEY,
+            score_count INTEGER NOT NULL,
+            score_sum REAL NOT NULL,
+            score_sumsq REAL NOT NULL,
+            score_min REAL,
+            score_max REAL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS subject_score_buckets (
+            subject TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            score_count INTEGER NOT NULL,
+            PRIMARY KEY (subject, bucket)
+        ) WITHOUT ROWID
+        """,
+        *SUBJECT_STATS_BACKFILL,
+        *(sql for _, sql in SUBJECT_STATS_TRIGGERS),
+    ]),
+    (4, "student_search trigram index on student_id, name and prn", [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS student_search
+        USING fts5(student_id, name, prn, tokenize = 'trigram')
+        """,
+        "DELETE FROM student_search",
+        "INSERT INTO student_search (student_id, name, prn) SELECT student_id, name, prn FROM students",
+        *(sql for _, sql in STUDENT_SEARCH_TRIGGERS),
+    ]),
+    (5, "risk_scores table for persisted model output", [
+        # reasons is a JSON array of strings. Rows are keyed by student_id;
+        # since migration 11 only students' own scores are kept here.
+        """
+        CREATE TABLE IF NOT EXISTS risk_scores (
+            student_id TEXT PRIMARY KEY,
+            high_risk_prob REAL,
+            risk_level TEXT,
+            reasons TEXT,
+            advice TEXT,
+            model_version TEXT,
+            scored_at TEXT
+        )
+        """,
+    ]),
+    (6, "risk_dirty queue for incremental rescoring", [
+        """
+        CREATE TABLE IF NOT EXISTS risk_dirty (
+            student_id TEXT PRIMARY KEY
+        ) WITHOUT ROWID
+        """,
+        # Students without a stored score start out queued.
+        """
+        INSERT OR IGNORE INTO risk_dirty (student_id)
+        SELECT student_id FROM students
+        WHERE student_id NOT IN (SELECT student_id FROM risk_scores)
+        """,
+        *(sql for _, sql in RISK_DIRTY_TRIGGERS),
+    ]),
+    (7, "counseling thresholds table and reason_codes bitmask on risk_scores", [
+        """
+        CREATE TABLE IF NOT EXISTS counseling_thresholds (
+            name TEXT PRIMARY KEY,
+            value REAL NOT NULL
+        )
+        """,
+        """
+        INSERT OR IGNORE INTO counseling_thresholds (name, value)
+        VALUES ('attendance_min', 75), ('avg_score_min', 50)
+        """,
+        "ALTER TABLE risk_scores ADD COLUMN reason_codes INTEGER",
+        "ALTER TABLE risk_scores DROP COLUMN reasons",
+        "ALTER TABLE risk_scores DROP COLUMN advice",
+        # Existing scores have no reason codes yet.
+        "INSERT OR IGNORE INTO risk_dirty (student_id) SELECT student_id FROM students",
+        *(sql for _, sql in COUNSELING_THRESHOLD_TRIGGERS),
+    ]),
+    (8, "covering index for per-subject trend series", [
+        # Superset of ix_test_scores_student_test: the trends query also
+        # reads subject, and per-student AVG(test_score) is still covered.
+        """
+        CREATE INDEX IF NOT EXISTS ix_test_scores_student_trend
+        ON test_scores (student_id, test_number, subject, test_score)
+        """,
+        "DROP INDEX IF EXISTS ix_test_scores_student_test",
+    ]),
+    (9, "upload_jobs table for background CSV uploads", [
+        """
+        CREATE TABLE IF NOT EXISTS upload_jobs (
+            job_id TEXT PRIMARY KEY,
+            filename TEXT,
+            state TEXT NOT NULL,
+            chunks INTEGER NOT NULL DEFAULT 0,
+            rows_read INTEGER NOT NULL DEFAULT 0,
+            rows_skipped_existing INTEGER NOT NULL DEFAULT 0,
+            students_added INTEGER NOT NULL DEFAULT 0,
+            scores_added INTEGER NOT NULL DEFAULT 0,
+            scores_duplicate INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )
+        """,
+    ]),
+    (10, "dedup_state high-water marks for incremental clean_db.py runs", [
+        """
+        CREATE TABLE IF NOT EXISTS dedup_state (
+            table_name TEXT PRIMARY KEY,
+            last_rowid INTEGER NOT NULL
+        )
+        """,
+    ]),
+    (11, "batch_risk_scores table for batch_score.py --table output", [
+        # risk_scores is what the app serves; scores of external files go here.
+        """
+        CREATE TABLE IF NOT EXISTS batch_risk_scores (
+            student_id TEXT PRIMARY KEY,
+            high_risk_prob REAL,
+            risk_level TEXT,
+            reason_codes INTEGER,
+            model_version TEXT,
+            scored_at TEXT
+        )
+        """,
+        # Earlier --table runs wrote into risk_scores: move rows for ids that
+        # are not students, and rescore everyone in case a file shared ids
+        # with real students and overwrote their scores.
+        """
+        INSERT OR REPLACE INTO batch_risk_scores
+            (student_id, high_risk_prob, risk_level, reason_codes, model_version, scored_at)
+        SELECT student_id, high_risk_prob, risk_level, reason_codes, model_version, scored_at
+        FROM risk_scores WHERE student_id NOT IN (SELECT student_id FROM students)
+        """,
+        "DELETE FROM risk_scores WHERE student_id NOT IN (SELECT student_id FROM students)",
+        "INSERT OR IGNORE INTO risk_dirty (student_id) SELECT student_id FROM students",
+    ]),
+    (12, "rebuild student_search without duplicate rows", [
+        # db_setup.py used INSERT OR REPLACE, which does not fire the delete
+        # trigger: a student listed twice in its CSV got two index rows.
+        "DELETE FROM student_search",
+        "INSERT INTO student_search (student_id, name, prn) SELECT student_id, name, prn FROM students",
+    ]),
+    (13, "upload_jobs.rows_skipped_missing_id for rows without a student_id", [
+        "ALTER TABLE upload_jobs ADD COLUMN rows_skipped_missing_id INTEGER NOT NULL DEFAULT 0",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, verbose: bool = False) -> tuple[int, int]:
+    """Apply pending migrations in order. Returns (from_version, to_version)."""
+    start_version = get_version(conn)
+    for version, description, statements in MIGRATIONS:
+        if version <= get_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-check under the write lock in case another process migrated.
+            if version <= get_version(conn):
+                conn.rollback()
+                continue
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        if verbose:
+            print(f"Applied migration {version}: {description}")
+    return start_version, get_version(conn)
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    conn = connect(db_path)
+    try:
+        start_version, end_version = migrate(conn, verbose=True)
+    finally:
+        conn.close()
+    if start_version == end_version:
+        print(f"✅ {db_path} is already at schema version {end_version}.")
+    else:
+        print(f"✅ Upgraded {db_path} from schema version {start_version} to {end_version}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import os
+from collections import namedtuple
+
+import numpy as np
+
+# One file instead of three pickles: the booster in XGBoost's native UBJ
+# format (or the coefficients of a linear model) plus the scaler and
+# encoder parameters as plain arrays. Loading it needs numpy, and xgboost
+# only for a booster - no sklearn, no unpickling.
+BUNDLE_FILE = 'risk_bundle.npz'
+
+# Duck-typed stand-ins for the fitted StandardScaler / OneHotEncoder:
+# prediction only reads mean_/scale_ and categories_.
+ScalerParams = namedtuple('ScalerParams', ['mean_', 'scale_'])
+EncoderParams = namedtuple('EncoderParams', ['categories_'])
+
+# Everything a prediction needs, swapped as one reference so a request never
+# mixes the scaler of one model with the booster of another.
+ModelArtifacts = namedtuple('ModelArtifacts', ['version', 'model', 'scaler', 'encoder', 'features', 'classes'])
+
+
+class BoosterModel:
+    """predict_proba over a native xgboost.Booster (multi:softprob)."""
+
+    kind = 'xgboost'
+
+    def __init__(self, booster, classes):
+        self.booster = booster
+        self.classes_ = np.asarray(classes)
+
+    def predict_proba(self, X):
+        proba = self.booster.inplace_predict(X)
+        if proba.ndim == 1:
+            # binary:logistic returns only P(class 1)
+            proba = np.column_stack([1.0 - proba, proba])
+        return proba
+
+    def to_arrays(self):
+        return {'booster': np.frombuffer(self.booster.save_raw('ubj'), dtype=np.uint8)}
+
+
+class LinearModel:
+    """predict_proba for a multinomial linear model (softmax over X @ coef.T + intercept)."""
+
+    kind = 'linear'
+
+    def __init__(self, coef, intercept, classes):
+        self.coef = np.asarray(coef, dtype=np.float32)
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+        self.classes_ = np.asarray(classes)
+
+    def predict_proba(self, X):
+        logits = X @ self.coef.T + self.intercept
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+    def to_arrays(self):
+        return {'coef': self.coef, 'intercept': self.intercept}
+
+
+def compact_model(model, classes):
+    """Convert a fitted XGBClassifier / LogisticRegression to a bundle model."""
+    if isinstance(model, (BoosterModel, LinearModel)):
+        return model
+    if hasattr(model, 'get_booster'):
+        return BoosterModel(model.get_booster(), classes)
+    if hasattr(model, 'coef_'):
+        coef, intercept = model.coef_, model.intercept_
+        if coef.shape[0] == 1:
+            # Binary LogisticRegression: logits (0, z) give the same softmax.
+            coef = np.vstack([np.zeros_like(coef), coef])
+            intercept = np.concatenate([[0.0], intercept])
+        return LinearModel(coef, intercept, classes)
+    raise TypeError(f"Cannot bundle model of type {type(model).__name__}")
+
+
+def save_bundle(artifacts, path: str = BUNDLE_FILE):
+    """Write `artifacts` to one .npz, atomically."""
+    model = compact_model(artifacts.model, artifacts.classes)
+    arrays = {
+        'version': np.array(artifacts.version),
+        'kind': np.array(model.kind),
+        'features': np.array(artifacts.features),
+        'classes': np.asarray(artifacts.classes).astype(str),
+        'fee_categories': np.asarray(artifacts.encoder.categories_[0]).astype(str),
+        'scaler_mean': np.asarray(artifacts.scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(artifacts.scaler.scale_, dtype=np.float64),
+        **model.to_arrays(),
+    }
+    tmp = f"{path}.tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def load_bundle(path: str = BUNDLE_FILE):
+    """Load a bundle written by save_bundle as ModelArtifacts."""
+    with np.load(path, allow_pickle=False) as data:
+        classes = data['classes']
+        if str(data['kind']) == 'xgboost':
+            import xgboost
+
+            booster = xgboost.Booster()
+            booster.load_model(bytearray(data['booster'].tobytes()))
+            model = BoosterModel(booster, classes)
+        else:
+            model = LinearModel(data['coef'], data['intercept'], classes)
+
+        return ModelArtifacts(
+            version=str(data['version']),
+            model=model,
+            scaler=ScalerParams(data['scaler_mean'], data['scaler_scale']),
+            encoder=EncoderParams([data['fee_categories'].astype(object)]),
+            features=data['features'].tolist(),
+            classes=classes,
+        )
@@ -0,0 +1,100 @@
+import base64
+import json
+
+import numpy as np
+
+# Columns /api/students can be sorted and paged by. Each gets a precomputed
+# order (ties broken by student_id) whenever the risk store is rebuilt.
+SORT_FIELDS = ('student_id', 'high_risk_prob')
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def build_sort_orders(df) -> dict:
+    """Return {field: (order, keys, sorted_keys)} for every sort field present in `df`.
+
+    `keys` is the column as a sortable array, `order` the row positions
+    sorted by (key, student_id) and `sorted_keys` is keys[order], kept so
+    paging never has to gather it again.
+    """
+    student_ids = df['student_id'].to_numpy(dtype=str)
+    order = np.argsort(student_ids, kind='stable')
+    orders = {'student_id': (order, student_ids, student_ids[order])}
+    for field in SORT_FIELDS[1:]:
+        if field in df.columns:
+            # Unscored rows sort first; probabilities are never negative.
+            keys = df[field].astype(np.float64).fillna(-1.0).to_numpy()
+            order = np.lexsort((student_ids, keys))
+            orders[field] = (order, keys, keys[order])
+    return orders
+
+
+def parse_sort(sort: str):
+    """'high_risk_prob' / '-high_risk_prob' -> (field, descending)."""
+    descending = sort.startswith('-')
+    field = sort.lstrip('-+')
+    if field not in SORT_FIELDS:
+        raise ValueError(f"Invalid sort field '{field}'. Use one of: {', '.join(SORT_FIELDS)}.")
+    return field, descending
+
+
+def parse_limit(value: str) -> int:
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be an integer.")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+    return limit
+
+
+def encode_cursor(value, student_id) -> str:
+    raw = json.dumps([value, student_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError for anything malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, student_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    return value, str(student_id)
+
+
+def keyset_page(order, keys, sorted_keys, student_ids, limit: int, cursor=None, descending: bool = False):
+    """Return (positions, next_cursor) for one page.
+
+    `order` lists row positions sorted by (key, student_id) and
+    `sorted_keys` is keys[order]; `keys` and `student_ids` are the full
+    columns. The cursor is the (key, student_id) of the last row already
+    returned, so the page starts right after it with two binary searches
+    over sorted_keys (plus one over the ids tied on the key) instead of an
+    offset scan.
+    """
+    if cursor is None:
+        start = len(order) if descending else 0
+    else:
+        value, last_id = cursor
+        try:
+            value = keys.dtype.type(value)
+        except (TypeError, ValueError):
+            raise ValueError("Cursor does not match the sort field.")
+        lo = np.searchsorted(sorted_keys, value, side='left')
+        hi = np.searchsorted(sorted_keys, value, side='right')
+        tied_ids = student_ids[order[lo:hi]]
+        start = lo + np.searchsorted(tied_ids, last_id, side='left' if descending else 'right')
+
+    if descending:
+        page = order[max(start - limit, 0):start][::-1]
+        has_more = start - limit > 0
+    else:
+        page = order[start:start + limit]
+        has_more = start + limit < len(order)
+
+    next_cursor = None
+    if has_more:
+        last = page[-1]
+        next_cursor = encode_cursor(keys[last].item(), str(student_ids[last]))
+    return page, next_cursor
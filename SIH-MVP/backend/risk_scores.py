@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+
+import pandas as pd
+
+from db import connection, transaction
+from features import score_frame
+from insights import DEFAULT_THRESHOLDS, load_thresholds, reason_codes
+
+RESCORE_BATCH = int(os.environ.get('RESCORE_BATCH', '500'))
+SCORE_COLUMNS = ['student_id', 'high_risk_prob', 'risk_level', 'reason_codes']
+
+# Model inputs for a batch of students; avg_test_score comes off
+# ix_test_scores_student_trend without touching the table.
+FEATURES_SQL = """
+    SELECT s.student_id, s.attendance_percentage, s.fee_status,
+           COALESCE(AVG(t.test_score), 0) AS avg_test_score
+    FROM students s
+    LEFT JOIN test_scores t ON t.student_id = s.student_id
+    WHERE s.student_id IN ({placeholders})
+    GROUP BY s.student_id
+"""
+
+# Stored scores that are still current: written by the active model and not
+# queued for rescoring.
+CURRENT_SCORES_SQL = """
+    SELECT r.student_id, r.high_risk_prob, r.risk_level, r.reason_codes
+    FROM risk_scores r
+    WHERE r.model_version IS ?
+      AND NOT EXISTS (SELECT 1 FROM risk_dirty d WHERE d.student_id = r.student_id)
+"""
+
+
+def score_students(df: pd.DataFrame, artifacts, thresholds=DEFAULT_THRESHOLDS) -> pd.DataFrame:
+    """Score rows with student_id, attendance_percentage, avg_test_score and fee_status.
+
+    Returns one row per input row with SCORE_COLUMNS; reason_codes is the
+    insights bitmask (rendered to text only when a row is returned).
+    """
+    high_risk_prob, risk_level = score_frame(artifacts, df)
+    return pd.DataFrame({
+        'student_id': df['student_id'].to_numpy(),
+        'high_risk_prob': high_risk_prob.astype(float),
+        'risk_level': risk_level,
+        'reason_codes': reason_codes(df['attendance_percentage'], df['avg_test_score'],
+                                     df['fee_status'], thresholds),
+    })
+
+
+def upsert_scores(conn, scored: pd.DataFrame, model_version: str, table: str = 'risk_scores'):
+    scored_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    rows = zip(*(scored[col].tolist() for col in SCORE_COLUMNS))
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {table} "
+        "(student_id, high_risk_prob, risk_level, reason_codes, model_version, scored_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (row + (model_version, scored_at) for row in rows)
+    )
+
+
+def mark_stale(conn, model_version: str) -> int:
+    """Queue every student without a score from `model_version`.
+
+    After a model swap this is the whole cohort; on a restart with the same
+    model it is nobody.
+    """
+    return conn.execute(
+        """
+        INSERT OR IGNORE INTO risk_dirty (student_id)
+        SELECT s.student_id FROM students s
+        LEFT JOIN risk_scores r ON r.student_id = s.student_id
+        WHERE r.model_version IS NOT ?
+        """,
+        (model_version,)
+    ).rowcount
+
+
+def rescore_batch(artifacts, batch_size: int = RESCORE_BATCH) -> int:
+    """Score up to batch_size queued students in one transaction. Returns the count taken."""
+    with transaction() as conn:
+        ids = [row[0] for row in conn.execute("SELECT student_id FROM risk_dirty LIMIT ?", (batch_size,))]
+        if not ids:
+            return 0
+        placeholders = ", ".join("?" * len(ids))
+        df = pd.read_sql_query(FEATURES_SQL.format(placeholders=placeholders), conn, params=ids)
+        if not df.empty:
+            df['student_id'] = df['student_id'].astype(str)
+            upsert_scores(conn, score_students(df, artifacts, load_thresholds(conn)), artifacts.version)
+        # Queued ids that no longer exist (renamed students) lose their score.
+        gone = set(ids) - set(df['student_id'])
+        conn.executemany("DELETE FROM risk_scores WHERE student_id = ?", ((sid,) for sid in gone))
+        conn.executemany("DELETE FROM risk_dirty WHERE student_id = ?", ((sid,) for sid in ids))
+    return len(ids)
+
+
+class RescoreWorker:
+    """Drains the risk_dirty queue in batches.
+
+    Writers call wake() and return; the background thread rescores. Readers
+    call current_scores(), which scores queued students in memory and never
+    waits on the queue or the write lock. drain() finishes the queue on the
+    calling thread (startup, scripts); it shares the background thread's
+    lock, so a batch is never scored twice.
+    """
+
+    def __init__(self, get_artifacts, batch_size: int = RESCORE_BATCH):
+        self._get_artifacts = get_artifacts
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.model_version = None
+        self.last_error = None
+
+    def pending(self) -> bool:
+        with connection() as conn:
+            return conn.execute("SELECT 1 FROM risk_dirty LIMIT 1").fetchone() is not None
+
+    def drain(self):
+        """Rescore everything queued. Returns an error message or None.
+
+        The first drain under a new model version first queues every score
+        written by another version.
+        """
+        artifacts = self._get_artifacts()
+        if artifacts is None:
+            return "AI model not loaded. Restart server."
+        with self._lock:
+            if artifacts.version != self.model_version:
+                with transaction() as conn:
+                    mark_stale(conn, artifacts.version)
+                self.model_version = artifacts.version
+            while self.pending() and rescore_batch(artifacts, self.batch_size):
+                pass
+        return None
+
+    def current_scores(self, df: pd.DataFrame):
+        """Current SCORE_COLUMNS for the students in df (merged rows with the model inputs).
+
+        Stored scores are used where they are current; the rest are scored
+        here and only persisted later by the background drain. A one-row df
+        is a point lookup. Returns (scores_df, error).
+        """
+        artifacts = self._get_artifacts()
+        if artifacts is None:
+            return None, "AI model not loaded. Restart server."
+        with connection() as conn:
+            if len(df) == 1:
+                stored = pd.read_sql_query(CURRENT_SCORES_SQL + " AND r.student_id = ?", conn,
+                                           params=(artifacts.version, str(df['student_id'].iloc[0])))
+            else:
+                stored = pd.read_sql_query(CURRENT_SCORES_SQL, conn, params=(artifacts.version,))
+            stored['student_id'] = stored['student_id'].astype(str)
+            stale = df[~df['student_id'].isin(stored['student_id'])]
+            if stale.empty:
+                return stored, None
+            thresholds = load_thresholds(conn)
+        self.wake()
+        scored = score_students(stale.reset_index(drop=True), artifacts, thresholds)
+        if stored.empty:
+            return scored, None
+        return pd.concat([stored, scored], ignore_index=True), None
+
+    def wake(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='risk-rescore', daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                self.last_error = self.drain()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Background rescoring failed: {e}")
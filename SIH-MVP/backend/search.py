@@ -0,0 +1,46 @@
+import sqlite3
+
+# Trigram MATCH needs at least three characters; shorter queries fall back to
+# LIKE over the same (small) index table.
+MIN_MATCH_CHARS = 3
+
+# Exact student_id/PRN hits first, then prefix hits on any column, then the
+# FTS5 bm25 rank (lower is better).
+_RANK_ORDER = """
+    ORDER BY
+        (student_id = :q COLLATE NOCASE OR prn = :q COLLATE NOCASE) DESC,
+        (student_id LIKE :prefix ESCAPE '\\' OR name LIKE :prefix ESCAPE '\\'
+            OR prn LIKE :prefix ESCAPE '\\') DESC,
+        {rank}student_id
+"""
+
+
+def _escape_like(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_student_ids(conn: sqlite3.Connection, query: str, limit: int = -1) -> list[str]:
+    """Return ids of students whose student_id, name or PRN contains `query`, best match first."""
+    query = query.strip()
+    if not query:
+        return []
+    params = {
+        'q': query,
+        'prefix': _escape_like(query) + '%',
+        'limit': limit,
+    }
+    if len(query) >= MIN_MATCH_CHARS:
+        # A quoted string is a phrase; with the trigram tokenizer that is a
+        # case-insensitive substring match against any column.
+        params['match'] = '"' + query.replace('"', '""') + '"'
+        sql = ("SELECT student_id FROM student_search WHERE student_search MATCH :match"
+               + _RANK_ORDER.format(rank='rank, ') + " LIMIT :limit")
+    else:
+        params['contains'] = '%' + _escape_like(query) + '%'
+        sql = ("SELECT student_id FROM student_search "
+               "WHERE student_id LIKE :contains ESCAPE '\\' OR name LIKE :contains ESCAPE '\\' "
+               "OR prn LIKE :contains ESCAPE '\\'"
+               + _RANK_ORDER.format(rank='') + " LIMIT :limit")
+    # A student has one index row, but a write that bypassed the triggers
+    # (INSERT OR REPLACE does not fire the delete trigger) could leave two.
+    return list(dict.fromkeys(row[0] for row in conn.execute(sql, params)))
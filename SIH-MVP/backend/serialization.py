@@ -0,0 +1,89 @@
+import gzip
+import json
+
+import numpy as np
+from flask import Response, request
+
+# orjson writes NaN as null and understands NumPy arrays and scalars, so a
+# frame can be encoded straight from its columns. Without it the stdlib json
+# module is used, with NaN swapped for None first.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Below this size compression costs more than the bytes it saves.
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+
+def _orjson_default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _column_list(values: np.ndarray) -> list:
+    # The stdlib json module would write NaN as a bare NaN token.
+    return [None if isinstance(v, float) and v != v else v for v in values.tolist()]
+
+
+def dumps(obj) -> bytes:
+    """Encode plain Python/NumPy data (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_orjson_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_orjson_default, separators=(',', ':')).encode()
+
+
+def frame_to_json(df, orient: str = 'records') -> bytes:
+    """Serialize a DataFrame without going through to_dict().
+
+    orient='records' gives the usual list of row objects; orient='columns'
+    gives {"columns": [...], "data": [[...column values...], ...]}, which is
+    smaller and cheaper to build and parse.
+    """
+    columns = [str(col) for col in df.columns]
+    if orient == 'columns':
+        data = [df[col].to_numpy() for col in df.columns]
+        if orjson is not None:
+            # Object columns go through _orjson_default -> tolist().
+            return dumps({'columns': columns, 'data': data})
+        return dumps({'columns': columns, 'data': [_column_list(values) for values in data]})
+
+    if orjson is None:
+        values = [_column_list(df[col].to_numpy()) for col in df.columns]
+        return dumps([dict(zip(columns, row)) for row in zip(*values)])
+    values = [df[col].to_numpy().tolist() for col in df.columns]
+    return orjson.dumps([dict(zip(columns, row)) for row in zip(*values)])
+
+
+def _compress(body: bytes):
+    """Compress `body` for the client's Accept-Encoding; returns (body, encoding)."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    encoding = request.accept_encodings.best_match(offered)
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), 'gzip'
+    return body, None
+
+
+def json_response(body: bytes, status: int = 200, headers=None) -> Response:
+    """A JSON Response from pre-encoded bytes, compressed when the client accepts it."""
+    body, encoding = _compress(body)
+    response = Response(body, status=status, mimetype='application/json', headers=headers)
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
@@ -1,8 +1,8 @@
-import sqlite3
+from db import connect
 from werkzeug.security import generate_password_hash
 
 def setup_auth_database():
-    conn = sqlite3.connect('students.db')
+    conn = connect()
     cursor = conn.cursor()
 
     # Create the users table
@@ -0,0 +1,211 @@
+import argparse
+import os
+import threading
+import time
+
+# pyarrow is optional: without it snapshots are simply not written and the
+# download endpoint reports them as unavailable.
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'snapshots')
+# Writes within this many seconds of each other share one snapshot.
+SNAPSHOT_DELAY = float(os.environ.get('SNAPSHOT_DELAY', '2'))
+# Arrow IPC is written uncompressed so readers can memory-map it and scan
+# columns without copying; Parquet is compressed for download.
+SNAPSHOT_FILES = {'arrow': 'cohort.arrow', 'parquet': 'cohort.parquet'}
+MIMETYPES = {'arrow': 'application/vnd.apache.arrow.file', 'parquet': 'application/vnd.apache.parquet'}
+PARQUET_COMPRESSION = 'zstd'
+
+
+def snapshot_path(fmt: str = 'arrow', directory: str = SNAPSHOT_DIR) -> str:
+    return os.path.join(directory, SNAPSHOT_FILES[fmt])
+
+
+def _write_atomic(path: str, write):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_snapshot(df, version: str, directory: str = SNAPSHOT_DIR) -> dict:
+    """Write the cohort frame as Arrow IPC and Parquet, replacing the previous pair.
+
+    Each file is swapped in with os.replace, so readers see the old or the
+    new snapshot, never a partial one. `version` is stored in the schema
+    metadata.
+    """
+    os.makedirs(directory, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'data_version': str(version).encode(),
+        b'written_at': time.strftime('%Y-%m-%dT%H:%M:%S').encode(),
+    })
+
+    def write_arrow(path):
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    # Parquet first: snapshot_version() reads the Arrow file, so once it
+    # reports the new version both files have it.
+    _write_atomic(snapshot_path('parquet', directory),
+                  lambda path: pq.write_table(table, path, compression=PARQUET_COMPRESSION))
+    _write_atomic(snapshot_path('arrow', directory), write_arrow)
+    return {'rows': table.num_rows, 'version': str(version)}
+
+
+def open_snapshot(path: str = None):
+    """The Arrow snapshot as a pyarrow Table backed by a memory map (no copy, no parse)."""
+    source = pa.memory_map(path or snapshot_path('arrow'))
+    return pa.ipc.open_file(source).read_all()
+
+
+def _version_of(schema):
+    version = (schema.metadata or {}).get(b'data_version')
+    return version.decode() if version is not None else None
+
+
+def snapshot_version(directory: str = SNAPSHOT_DIR):
+    """The data version the current snapshot was written at, or None."""
+    path = snapshot_path('arrow', directory)
+    if pa is None or not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path) as source:
+            return _version_of(pa.ipc.open_file(source).schema)
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def file_version(f, fmt: str):
+    """The data version stored in an open snapshot file; leaves f at the start."""
+    schema = pa.ipc.open_file(f).schema if fmt == 'arrow' else pq.read_schema(f)
+    f.seek(0)
+    return _version_of(schema)
+
+
+class SnapshotWriter:
+    """Rewrites the snapshot in the background after data changes.
+
+    `load()` returns (df, version) for the current cohort, or (None, None)
+    if it cannot be built. wake() returns at once; bursts of writes within
+    SNAPSHOT_DELAY collapse into one snapshot, and nothing is written if
+    the files already hold the current version (e.g. another worker wrote
+    them).
+    """
+
+    def __init__(self, load, directory: str = SNAPSHOT_DIR, delay: float = SNAPSHOT_DELAY):
+        self._load = load
+        self.directory = directory
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.last_error = None
+
+    @property
+    def enabled(self) -> bool:
+        return pa is not None
+
+    def refresh(self):
+        """Write the snapshot now unless it is already current. Returns its version or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            df, version = self._load()
+            if df is None:
+                return None
+            version = str(version)
+            if snapshot_version(self.directory) != version:
+                write_snapshot(df, version, self.directory)
+            return version
+
+    def open(self, fmt: str):
+        """Bring the snapshot up to date and open its `fmt` file. Returns (file, version) or (None, None).
+
+        The version is read from the opened file itself, so it always
+        names the bytes being served, even if a newer snapshot is swapped
+        in (by this or another process) after refresh() returns.
+        """
+        if self.refresh() is None:
+            return None, None
+        f = open(snapshot_path(fmt, self.directory), 'rb')
+        try:
+            return f, file_version(f, fmt)
+        except BaseException:
+            f.close()
+            raise
+
+    def wake(self):
+        if not self.enabled:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='cohort-snapshot', daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.delay)
+            self._wakeup.clear()
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Writing the cohort snapshot failed: {e}")
+
+
+def summarize(table) -> dict:
+    """Risk-level counts and mean probability straight off the Arrow columns."""
+    counts = pc.value_counts(table['risk_level']).to_pylist()
+    return {
+        'rows': table.num_rows,
+        'risk_levels': {entry['values']: entry['counts'] for entry in counts},
+        'mean_high_risk_prob': pc.mean(table['high_risk_prob']).as_py(),
+        'data_version': (table.schema.metadata or {}).get(b'data_version', b'').decode() or None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write or inspect the columnar cohort snapshot.")
+    parser.add_argument('--write', action='store_true',
+                        help="rebuild the snapshot from the database (scores queued students first)")
+    parser.add_argument('--dir', default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    if pa is None:
+        print("❌ pyarrow is not installed.")
+        return
+    if args.write:
+        import main as app
+
+        error = app.RESCORER.drain()
+        if not error:
+            df, error = app.build_risk_store()
+        if error:
+            print(f"❌ Error: {error}")
+            return
+        stats = write_snapshot(df, app.DATA_VERSION.current()[0], args.dir)
+        print(f"✅ Wrote {stats['rows']:,} rows to {args.dir}")
+
+    path = snapshot_path('arrow', args.dir)
+    if not os.path.exists(path):
+        print(f"❌ No snapshot at {path}. Run with --write first.")
+        return
+    for key, value in summarize(open_snapshot(path)).items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from model_bundle import BUNDLE_FILE, ModelArtifacts, compact_model, load_bundle, save_bundle
+
+# Legacy pickles, read only when no bundle exists yet.
+MODEL_FILE = 'risk_model.joblib'
+SCALER_FILE = 'scaler.joblib'
+ENCODER_FILE = 'encoder.joblib'
+RETRAIN_AFTER_ROWS = int(os.environ.get('RETRAIN_AFTER_ROWS', '1000'))
+
+# Historical data (used only if DB is empty)
+historical_data = {
+    'student_id': ['101', '102', '103', '104', '105', '106', '107', '108', '109', '110'],
+    'attendance_percentage': [82, 65, 90, 72, 55, 95, 68, 85, 78, 62],
+    'avg_test_score': [81.5, 37.5, 90.0, 50.0, 32.0, 88.0, 55.0, 75.0, 60.0, 45.0],
+    'fee_status': ['Paid', 'Overdue', 'Paid', 'Overdue', 'Overdue', 'Paid', 'Overdue', 'Paid', 'Paid', 'Overdue'],
+    'risk_label': ['Low', 'High', 'Low', 'Medium', 'High', 'Low', 'High', 'Low', 'Medium', 'High']
+}
+historical_df = pd.DataFrame(historical_data)
+
+
+def label_risk(df: pd.DataFrame) -> np.ndarray:
+    """Rule-based labels used when the training data has no risk_label column."""
+    attendance = df['attendance_percentage']
+    avg_score = df['avg_test_score']
+    return np.select(
+        [
+            (attendance < 70) & (avg_score < 50),
+            (attendance < 80) | (avg_score < 60) | (df['fee_status'] == 'Overdue'),
+        ],
+        ['High', 'Medium'],
+        default='Low'
+    )
+
+
+def fit_artifacts(train_df: pd.DataFrame, version: str) -> ModelArtifacts:
+    """Fit encoder, scaler and XGBoost classifier on a merged student frame."""
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+    from xgboost import XGBClassifier
+
+    if train_df.empty:
+        train_df = historical_df.copy()
+    train_df = train_df.reset_index(drop=True)
+
+    # Create labels if missing
+    if 'risk_label' not in train_df.columns:
+        train_df['risk_label'] = label_risk(train_df)
+
+    # Encode categorical
+    encoder = OneHotEncoder(handle_unknown='ignore')
+    train_encoded = pd.DataFrame(
+        encoder.fit_transform(train_df[['fee_status']]).toarray(),
+        columns=encoder.get_feature_names_out(['fee_status'])
+    )
+    train_df_processed = pd.concat([train_df.drop('fee_status', axis=1), train_encoded], axis=1)
+
+    features = ['attendance_percentage', 'avg_test_score'] + encoder.get_feature_names_out(['fee_status']).tolist()
+    X_train = train_df_processed[features]
+    classes, y_train = np.unique(train_df_processed['risk_label'].astype(str), return_inverse=True)
+
+    # Scale numerical features
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+
+    model = XGBClassifier(
+        n_estimators=200,
+        learning_rate=0.1,
+        max_depth=5,
+        random_state=42,
+        eval_metric="mlogloss"
+    )
+    model.fit(X_train_scaled, y_train)
+    return ModelArtifacts(version, compact_model(model, classes), scaler, encoder, features, classes)
+
+
+def save_artifacts(artifacts: ModelArtifacts):
+    """Write a versioned bundle, then atomically replace the canonical one."""
+    root, ext = os.path.splitext(BUNDLE_FILE)
+    save_bundle(artifacts, f"{root}.{artifacts.version}{ext}")
+    save_bundle(artifacts, BUNDLE_FILE)
+
+
+def load_legacy_artifacts():
+    """Load the three joblib pickles, or None if any is missing."""
+    if not (os.path.exists(MODEL_FILE) and os.path.exists(SCALER_FILE) and os.path.exists(ENCODER_FILE)):
+        return None
+    import joblib
+
+    model = joblib.load(MODEL_FILE)
+    scaler = joblib.load(SCALER_FILE)
+    encoder = joblib.load(ENCODER_FILE)
+    features = ['attendance_percentage', 'avg_test_score'] + encoder.get_feature_names_out(['fee_status']).tolist()
+    return ModelArtifacts('initial', model, scaler, encoder, features, np.asarray(model.classes_))
+
+
+def load_artifacts():
+    """Load the model bundle, converting the legacy pickles into one if needed.
+
+    Returns None when there is nothing to load.
+    """
+    if os.path.exists(BUNDLE_FILE):
+        return load_bundle(BUNDLE_FILE)
+    artifacts = load_legacy_artifacts()
+    if artifacts is None:
+        return None
+    save_bundle(artifacts, BUNDLE_FILE)
+    return artifacts._replace(model=compact_model(artifacts.model, artifacts.classes))
+
+
+def bundle_stamp():
+    """mtime of the model bundle, or None. Lets a process spot a bundle replaced by another."""
+    try:
+        return os.stat(BUNDLE_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def new_version() -> str:
+    """A unique model version: the training time plus a random suffix.
+
+    Scores are matched to the model by this string, so two retrains in the
+    same second must still differ.
+    """
+    return f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+class TrainingRunner:
+    """Runs retraining on a single background thread.
+
+    `load_training_frame()` supplies the data and `on_trained(artifacts)`
+    installs the result. Requests made while a job is queued or running
+    share that job instead of stacking up.
+    """
+
+    def __init__(self, load_training_frame, on_trained, retrain_after_rows: int = RETRAIN_AFTER_ROWS):
+        self._load_training_frame = load_training_frame
+        self._on_trained = on_trained
+        self.retrain_after_rows = retrain_after_rows
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-train')
+        self._lock = threading.Lock()
+        self._future = None
+        self.rows_since_train = 0
+        self.last_error = None
+        self.last_trained_at = None
+
+    def submit(self, reason: str = 'manual'):
+        with self._lock:
+            if self._future is not None and not self._future.done():
+                return self._future
+            self._future = self._executor.submit(self._run, reason)
+            return self._future
+
+    def record_new_rows(self, count: int):
+        """Count newly ingested rows and retrain once enough have landed."""
+        with self._lock:
+            self.rows_since_train += count
+            due = self.retrain_after_rows > 0 and self.rows_since_train >= self.retrain_after_rows
+        if due:
+            self.submit('new rows')
+
+    def status(self) -> dict:
+        with self._lock:
+            running = self._future is not None and not self._future.done()
+            return {
+                'training': running,
+                'rows_since_train': self.rows_since_train,
+                'retrain_after_rows': self.retrain_after_rows,
+                'last_trained_at': self.last_trained_at,
+                'last_error': self.last_error,
+            }
+
+    def _run(self, reason: str):
+        with self._lock:
+            rows_at_start = self.rows_since_train
+        try:
+            train_df = self._load_training_frame()
+            artifacts = fit_artifacts(train_df, new_version())
+            save_artifacts(artifacts)
+            self._on_trained(artifacts)
+        except Exception as e:
+            with self._lock:
+                self.last_error = f"{reason}: {e}"
+            print(f"❌ Background training failed ({reason}): {e}")
+            raise
+        with self._lock:
+            self.rows_since_train = max(self.rows_since_train - rows_at_start, 0)
+            self.last_error = None
+            self.last_trained_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        print(f"✅ Model {artifacts.version} trained in background ({reason}) and activated.")
+        return artifacts.version
@@ -0,0 +1,76 @@
+import os
+import threading
+from collections import OrderedDict
+
+from db import connection
+
+TREND_CACHE_SIZE = int(os.environ.get('TREND_CACHE_SIZE', '1024'))
+
+# One constant, parameterized statement: sqlite3 keeps it prepared in the
+# connection's statement cache, and ix_test_scores_student_trend answers it
+# from the index alone.
+TREND_SQL = """
+    SELECT subject, test_number, test_score
+    FROM test_scores
+    WHERE student_id = ?
+    ORDER BY test_number, subject
+"""
+
+
+class TrendService:
+    """Per-student score series with an LRU cache in front of SQLite.
+
+    Each entry remembers the data version (see http_cache.DataVersion) it
+    was read at and is only served while that version is current. Any write
+    - from this process or, with a shared version, another worker -
+    retires the whole cache. The version is read before the query, so a
+    read racing a write is retired too.
+    """
+
+    def __init__(self, current_version, maxsize: int = TREND_CACHE_SIZE):
+        self._current_version = current_version
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def series(self, student_id: str) -> list:
+        """[(subject, test_number, test_score), ...] ordered by test_number."""
+        version = self._current_version()
+        with self._lock:
+            entry = self._cache.get(student_id)
+            if entry is not None and entry[0] == version:
+                self._cache.move_to_end(student_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        with connection() as conn:
+            rows = conn.execute(TREND_SQL, (student_id,)).fetchall()
+
+        if self.maxsize > 0:
+            with self._lock:
+                self._cache[student_id] = (version, rows)
+                self._cache.move_to_end(student_id)
+                if len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def as_points(rows) -> list:
+    """The original trends shape: [{test_number, test_score}, ...]."""
+    return [{'test_number': test_number, 'test_score': test_score} for _, test_number, test_score in rows]
+
+
+def by_subject(rows) -> dict:
+    """{subject: [{test_number, test_score}, ...]} with each series in test order."""
+    series = {}
+    for subject, test_number, test_score in rows:
+        key = subject if subject is not None else ''
+        series.setdefault(key, []).append({'test_number': test_number, 'test_score': test_score})
+    return series
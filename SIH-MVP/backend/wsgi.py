@@ -0,0 +1,33 @@
+import os
+
+# Production entry point:
+#   gunicorn -c gunicorn.conf.py wsgi:app    (forked workers, see gunicorn.conf.py)
+#   python wsgi.py                           (waitress: one process, WEB_THREADS threads)
+#
+# With gunicorn's preload the model bundle, encoder/scaler parameters and the
+# scored cohort are loaded once in the master and shared copy-on-write by
+# every forked worker; workers never train or load their own copy at start.
+
+# XGBoost predicts through OpenMP, whose thread pool does not survive fork;
+# a single OpenMP thread per worker is also what a process-per-core setup wants.
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+WEB_HOST = os.environ.get('WEB_HOST', '127.0.0.1')
+WEB_PORT = int(os.environ.get('WEB_PORT', '5000'))
+WEB_THREADS = int(os.environ.get('WEB_THREADS', '8'))
+
+
+def create_app(preload: bool = True):
+    """Return the Flask app with the schema migrated and, if preload, the model and cohort loaded."""
+    import main
+
+    return main.prepare_app(preload)
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    from waitress import serve
+
+    serve(app, host=WEB_HOST, port=WEB_PORT, threads=WEB_THREADS)
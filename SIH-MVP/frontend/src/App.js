@@ -152,12 +152,22 @@ function DashboardPage() {
                 body: formData,
             });
             const data = await res.json();
-            if (res.ok) {
-                alert("✅ File uploaded and processed successfully!");
-                setRefresh(prev => !prev);
-            } else {
+            if (!res.ok) {
                 alert("❌ " + data.message);
+                return;
+            }
+            // The file is processed in the background; poll the job until it finishes.
+            let job = { state: "queued" };
+            while (job.state === "queued" || job.state === "running") {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                job = await (await fetch(`http://127.0.0.1:5000${data.status_url}`)).json();
+            }
+            if (job.state === "done") {
+                alert(`✅ File processed: ${job.students_added} new student(s), ${job.rows_read} row(s) read.`);
+            } else {
+                alert("❌ " + (job.error || job.message || "Upload failed."));
             }
+            setRefresh(prev => !prev);
         } catch (error) {
             console.error(error);
             alert("❌ Error uploading file.");
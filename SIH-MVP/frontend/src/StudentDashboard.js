@@ -37,12 +37,14 @@ function StudentDashboard() {
     const handleLogout = () => {
         logout();
         localStorage.removeItem("studentUsername");
+        localStorage.removeItem("sessionToken");
         navigate("/student-login");
     };
 
     useEffect(() => {
         const storedUsername = localStorage.getItem("studentUsername");
-        if (!storedUsername) {
+        const sessionToken = localStorage.getItem("sessionToken");
+        if (!storedUsername || !sessionToken) {
             navigate("/student-login");
             return;
         }
@@ -50,15 +52,18 @@ function StudentDashboard() {
         const fetchStudentData = async () => {
             setIsLoading(true);
             try {
-                // Fetch all students from backend API (or change to `/api/students/:id` if available)
-                const response = await fetch("http://127.0.0.1:5000/api/students");
-                if (!response.ok) throw new Error("Failed to fetch students");
-                const students = await response.json();
-
-                // Find student by username (assuming student_id === username)
-                const student = Array.isArray(students)
-                    ? students.find((s) => String(s.student_id) === String(storedUsername))
-                    : students && (String(students.student_id) === String(storedUsername) ? students : null);
+                // Fetch only this student (student_id === username) instead of the whole list
+                const response = await fetch("http://127.0.0.1:5000/api/student/me", {
+                    headers: { Authorization: `Bearer ${sessionToken}` },
+                });
+                if (response.status === 401) {
+                    // Session expired: log in again.
+                    localStorage.removeItem("sessionToken");
+                    navigate("/student-login");
+                    return;
+                }
+                if (!response.ok && response.status !== 404) throw new Error("Failed to fetch student");
+                const student = response.ok ? (await response.json()).info : null;
 
                 if (student) {
                     // Parse numeric values safely and provide sensible defaults
@@ -30,6 +30,7 @@ const StudentLoginPage = () => {
 
       if (response.ok && data.role === 'student') {
         localStorage.setItem('studentUsername', username);
+        localStorage.setItem('sessionToken', data.token);
         login('student', username); // Set AuthContext state
         navigate('/student-dashboard');
       } else {